@@ -8,16 +8,24 @@ Subcommands:
 Examples:
   python app.py bg   --name sea  --minutes 5 --seed 42 --out out/sea
   python app.py tone --mode both --freq 4    --minutes 30 --out out/theta
+  python app.py bg   --name rain --minutes 480 --stream | ffmpeg -i - rain.opus
 """
 
 from __future__ import annotations
 import argparse
+import importlib
 import os
+import sys
+from contextlib import nullcontext
 from pathlib import Path
 
 from bg_utils import SR
-from bg_core.engine import run_profile
-from sound import make as make_tone, save_wav, set_wav_metadata
+from bg_core.engine import load_profile, stream_lookahead, stream_loop, stream_normalized
+from bg_core.parallel import render_mmap, stream_parallel
+from bg_core.telemetry import Telemetry
+from pcm_stream import DEFAULT_QUEUE_BLOCKS, open_sink, pump, report
+from render_cache import RenderCache, cached_render, meta_spec
+from sound import FORMATS, open_writer, tone_blocks, track_metadata, write_tones, WavWriter
 
 
 # ---------------- BG (profiles) ----------------
@@ -29,17 +37,44 @@ def cmd_bg(args: argparse.Namespace) -> int:
 
     seed = None if args.seed < 0 else int(args.seed)
     level = None if args.level < 0 else float(args.level)
+    if args.mmap and (args.stream or args.loop > 0):
+        print("! --mmap writes a full-length file: not combinable with --stream or --loop.", file=sys.stderr)
+        return 2
+    if args.mmap and args.format != "wav":
+        print("! --mmap writes PCM in place: use --format wav.", file=sys.stderr)
+        return 2
+
+    # In --stream mode stdout may carry the audio: progress goes to stderr
+    log = sys.stderr if args.stream else sys.stdout
+    print(f"> BG profile: {args.name} | {args.minutes} min | seed={seed}", file=log)
+
+    telemetry = open_telemetry(args, SR)
 
-    print(f"> BG profile: {args.name} | {args.minutes} min | seed={seed}")
-    st = run_profile(str(profile_path), args.minutes, seed=seed, level=level)
+    def blocks():
+        if args.loop > 0:
+            # Seamless loop rendered once and repeated for the whole track
+            return stream_loop(str(profile_path), args.minutes, loop_sec=args.loop, seed=seed, level=level,
+                               telemetry=telemetry)
+        if args.stream:
+            # Live output: one pass with a look-ahead gain, no full peak scan before the first byte
+            return stream_lookahead(str(profile_path), args.minutes, seed=seed, level=level,
+                                    workers=args.workers, telemetry=telemetry)
+        if args.workers > 0:
+            # Block-aligned chunks rendered on a process pool, joined in order
+            return stream_parallel(str(profile_path), args.minutes, seed=seed, level=level, workers=args.workers)
+        # Two-pass streaming render written block by block (constant memory)
+        return stream_normalized(str(profile_path), args.minutes, seed=seed, level=level, telemetry=telemetry)
+
+    if args.stream:
+        rc = stream_out(args, blocks(), SR)
+        emit_profile_report(args, telemetry)
+        return rc
 
     outdir = Path(args.out)
     outdir.mkdir(parents=True, exist_ok=True)
-    out_path = outdir / f"{args.name}_{args.minutes:g}m.wav"
+    out_path = outdir / f"{args.name}_{args.minutes:g}m.{args.format}"
 
-    save_wav(str(out_path), st, SR)
-    set_wav_metadata(
-        str(out_path),
+    meta = dict(
         title=f"{args.title_prefix} {args.name} {args.minutes:g}m".strip(),
         artist=args.artist,
         comment="Generated by music4hz (ambient)",
@@ -49,7 +84,38 @@ def cmd_bg(args: argparse.Namespace) -> int:
         email=args.email,
         artwork_path=args.artwork,
     )
-    print(f"✓ Saved: {out_path}")
+
+    def render(path: str) -> None:
+        with stage(telemetry, "metadata"):
+            chunks = track_metadata(args.format, **meta)
+        if args.mmap:
+            # Workers write their own segments into the preallocated, mapped file
+            render_mmap(str(profile_path), args.minutes, path, seed=seed, level=level,
+                        workers=args.workers or None, metadata=chunks)
+            return
+        # Tags are written with the header: one sequential pass over the file
+        with open_writer(path, SR, 2, fmt=args.format, metadata=chunks, workers=args.encode_workers) as wf:
+            for blk in blocks():
+                with stage(telemetry, f"{args.format}_write", blk.shape[0]):
+                    wf.write(blk)
+
+    spec = {
+        "kind": "bg",
+        "profile": load_profile(str(profile_path)),
+        "seed": seed,
+        "level": level,
+        "minutes": float(args.minutes),
+        "loop": float(args.loop),
+        "sr": SR,
+        "meta": meta_spec(meta),
+    }
+    if args.mmap:
+        spec["writer"] = "mmap"  # per-segment dither: different bytes
+    if args.format != "wav":
+        spec["format"] = args.format
+    hit = cached_render(open_cache(args), spec, str(out_path), render)
+    print(f"✓ Saved: {out_path}" + (" (cached)" if hit else ""))
+    emit_profile_report(args, telemetry)
     return 0
 
 
@@ -59,45 +125,36 @@ def cmd_tone(args: argparse.Namespace) -> int:
 
     print(
         f"> Tone: mode={args.mode} | beat={args.freq:g} Hz | minutes={args.minutes} | "
-        f"amp={args.amp} | sr={args.sr} | binaural={tuple(args.binaural)} | iso_carrier={args.iso_carrier}"
+        f"amp={args.amp} | sr={args.sr} | binaural={tuple(args.binaural)} | iso_carrier={args.iso_carrier}",
+        file=sys.stderr if args.stream else sys.stdout,
     )
 
-    binaural, iso, sr = make_tone(
-        beat_hz=float(args.freq),
-        duration_sec=duration_sec,
-        sr=int(args.sr),
-        binaural_carriers=(float(args.binaural[0]), float(args.binaural[1])),
-        iso_carrier=float(args.iso_carrier),
-        amp=float(args.amp),
-    )
+    telemetry = open_telemetry(args, int(args.sr))
+
+    if args.stream:
+        if args.mode == "both":
+            print("! --stream carries one signal: pick --mode binaural or --mode iso.", file=sys.stderr)
+            return 2
+        synth = tone_blocks(float(args.freq), duration_sec, int(args.sr), tuple(args.binaural),
+                            float(args.iso_carrier), float(args.amp), modes=(args.mode,))
+        blocks = (b if b is not None else i for b, i in synth)
+        rc = stream_out(args, blocks, int(args.sr))
+        emit_profile_report(args, telemetry)
+        return rc
 
     outdir = Path(args.out)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    wrote_any = False
+    paths = {}
     if args.mode in ("binaural", "both"):
-        p = outdir / f"{args.freq:g}hz_binaural.wav"
-        save_wav(str(p), binaural, sr)
-        set_wav_metadata(
-            str(p),
-            title=f"{args.title_prefix} {args.freq:g} Hz Binaural".strip(),
-            artist=args.artist,
-            comment="Generated by music4hz",
-            year=args.year,
-            copyright_=args.copyright,
-            url=args.url,
-            email=args.email,
-            artwork_path=args.artwork,
-        )
-        print(f"✓ Saved: {p}")
-        wrote_any = True
-
+        paths["binaural"] = outdir / f"{args.freq:g}hz_binaural.{args.format}"
     if args.mode in ("iso", "both"):
-        p = outdir / f"{args.freq:g}hz_iso.wav"
-        save_wav(str(p), iso, sr)
-        set_wav_metadata(
-            str(p),
-            title=f"{args.title_prefix} {args.freq:g} Hz Isochronic".strip(),
+        paths["iso"] = outdir / f"{args.freq:g}hz_iso.{args.format}"
+
+    labels = {"binaural": "Binaural", "iso": "Isochronic"}
+    metas = {
+        mode: dict(
+            title=f"{args.title_prefix} {args.freq:g} Hz {labels[mode]}".strip(),
             artist=args.artist,
             comment="Generated by music4hz",
             year=args.year,
@@ -106,17 +163,147 @@ def cmd_tone(args: argparse.Namespace) -> int:
             email=args.email,
             artwork_path=args.artwork,
         )
-        print(f"✓ Saved: {p}")
+        for mode in paths
+    }
+    tone = dict(
+        beat_hz=float(args.freq),
+        duration_sec=duration_sec,
+        sr=int(args.sr),
+        binaural_carriers=(float(args.binaural[0]), float(args.binaural[1])),
+        iso_carrier=float(args.iso_carrier),
+        amp=float(args.amp),
+    )
+    specs = {mode: {"kind": "tone", "mode": mode, **tone, "meta": meta_spec(metas[mode])} for mode in paths}
+    if args.format != "wav":
+        for spec in specs.values():
+            spec["format"] = args.format
+
+    cache = open_cache(args)
+    hits = {mode for mode, p in paths.items() if cache is not None and cache.fetch(specs[mode], str(p))}
+    todo = {mode: p for mode, p in paths.items() if mode not in hits}
+    for p in todo.values():
+        p.unlink(missing_ok=True)  # may be a hard link into the cache
+
+    with stage(telemetry, "metadata"):
+        chunks = {mode: track_metadata(args.format, **metas[mode]) for mode in todo}
+    # Block-by-block synthesis streamed into the WAV writers (constant memory)
+    write_tones({mode: str(p) for mode, p in todo.items()}, **tone, telemetry=telemetry, metadata=chunks,
+                fmt=args.format, workers=args.encode_workers)
+
+    wrote_any = False
+    for mode, p in paths.items():
+        if mode in todo:
+            if cache is not None:
+                cache.store(specs[mode], str(p))
+        print(f"✓ Saved: {p}" + (" (cached)" if mode in hits else ""))
         wrote_any = True
 
     if not wrote_any:
         print("! Nothing written (check --mode).")
         return 2
 
+    emit_profile_report(args, telemetry)
     return 0
 
 
 # ---------------- CLI ----------------
+def open_telemetry(args: argparse.Namespace, sr: int):
+    """Telemetry for --profile-report / --profile-hook, else None (no overhead)."""
+    if not (args.profile_report or args.profile_hook):
+        return None
+    callback = None
+    if args.profile_hook:
+        module, _, func = args.profile_hook.partition(":")
+        callback = getattr(importlib.import_module(module), func or "record")
+    return Telemetry(sr, callback=callback)
+
+
+def stage(telemetry, name: str, frames: int = 0):
+    return telemetry.stage(name, frames) if telemetry is not None else nullcontext()
+
+
+def emit_profile_report(args: argparse.Namespace, telemetry) -> None:
+    if telemetry is None:
+        return
+    records = telemetry.finish()
+    if not args.profile_report:
+        return
+    text = Telemetry.format(records, args.profile_report)
+    if args.profile_out:
+        Path(args.profile_out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text, file=sys.stderr)
+
+
+def stream_out(args: argparse.Namespace, blocks, sr: int) -> int:
+    """Write rendered blocks as PCM to stdout / a named pipe (no file, no cache)."""
+    try:
+        sink = open_sink(args.stream)
+    except ValueError as e:
+        print(f"! --stream: {e}", file=sys.stderr)
+        return 2
+    try:
+        if args.stream_format == "flac":
+            writer = open_writer(sink, sr, 2, fmt="flac", workers=args.encode_workers)
+        else:
+            writer = WavWriter(sink, sr, 2, raw=args.stream_format == "raw")
+        with writer as wf:
+            stats = pump(blocks, wf, queue_blocks=args.stream_queue, sr=sr)
+    except BrokenPipeError:
+        stats = None
+    finally:
+        if sink is not sys.stdout.buffer:
+            try:
+                sink.close()
+            except BrokenPipeError:
+                pass
+    if stats is None or stats.get("broken_pipe"):
+        # Reader went away: silence the interpreter's final stdout flush
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    if stats is not None:
+        report(stats)
+    return 0
+
+
+def open_cache(args: argparse.Namespace):
+    """Return the render cache selected on the command line (None with --no-cache)."""
+    if args.no_cache:
+        return None
+    return RenderCache(args.cache_dir or None, max_bytes=int(args.cache_max_gb * 1024**3))
+
+
+def add_stream_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--stream", nargs="?", const="-", default="", metavar="TARGET",
+                   help="Write PCM to stdout ('-', the default), an existing named pipe, or 'fifo:PATH' "
+                        "(pipe created if missing) instead of a file")
+    p.add_argument("--stream-format", choices=["wav", "raw", "flac"], default="wav",
+                   help="Streamed WAV header (unknown-length sizes), raw s16le interleaved PCM or FLAC")
+    p.add_argument("--stream-queue", type=int, default=DEFAULT_QUEUE_BLOCKS,
+                   help="Rendered blocks buffered ahead of the writer")
+
+
+def add_format_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--format", choices=FORMATS, default="wav",
+                   help="Output container: 16-bit WAV or lossless FLAC (built-in encoder)")
+    p.add_argument("--encode-workers", type=int, default=0,
+                   help="Encode FLAC frames on this many processes (0 = in the render process)")
+
+
+def add_profile_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--profile-report", nargs="?", const="table", default="", choices=["table", "json"],
+                   help="Per-stage wall/CPU time, allocations and realtime factor (table or json, to stderr)")
+    p.add_argument("--profile-out", default="", help="Write the profile report to this file instead")
+    p.add_argument("--profile-hook", default="", metavar="MODULE:FUNC",
+                   help="Call FUNC(record) for every stage record (metrics collector)")
+
+
+def add_cache_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--no-cache", action="store_true", help="Always re-render (skip the render cache)")
+    p.add_argument("--cache-dir", default="", help="Render cache directory (default ~/.cache/music4hz)")
+    p.add_argument("--cache-max-gb", type=float, default=20.0, help="Render cache size cap (LRU eviction)")
+
+
 def list_profiles(profiles_dir="profiles"):
     """Return list of available profile names from profiles_dir."""
     if not os.path.isdir(profiles_dir):
@@ -139,6 +326,12 @@ def build_parser() -> argparse.ArgumentParser:
     bg.add_argument("--minutes", type=float, default=5.0)
     bg.add_argument("--level", type=float, default=-1.0, help="-1 = use profile default")
     bg.add_argument("--seed", type=int, default=-1)
+    bg.add_argument("--loop", type=float, default=0.0,
+                    help="Render a seamless loop of this many seconds and repeat it (0 = full render)")
+    bg.add_argument("--workers", type=int, default=0,
+                    help="Segment-parallel render on this many processes (0 = single-process streaming)")
+    bg.add_argument("--mmap", action="store_true",
+                    help="Preallocate the WAV and let workers write their segments into it via np.memmap")
     bg.add_argument("--out", default="out")
     bg.add_argument("--profiles-dir", default="profiles", help="Directory containing <name>.json profiles")
 
@@ -150,6 +343,10 @@ def build_parser() -> argparse.ArgumentParser:
     bg.add_argument("--url", default="https://tameronline.com")
     bg.add_argument("--email", default="info@tameronline.com")
     bg.add_argument("--artwork", default="image/logo.png")
+    add_cache_args(bg)
+    add_format_args(bg)
+    add_stream_args(bg)
+    add_profile_args(bg)
     bg.set_defaults(func=cmd_bg)
 
     # tone subcommand
@@ -170,6 +367,10 @@ def build_parser() -> argparse.ArgumentParser:
     tone.add_argument("--url", default="https://tameronline.com")
     tone.add_argument("--email", default="info@tameronline.com")
     tone.add_argument("--artwork", default="image/logo.png")
+    add_cache_args(tone)
+    add_format_args(tone)
+    add_stream_args(tone)
+    add_profile_args(tone)
     tone.set_defaults(func=cmd_tone)
 
     return p
@@ -0,0 +1,236 @@
+"""
+music4hz — in-process parallel batch renderer
+
+Renders a manifest of tone / ambient jobs on a process pool, calling
+`sound.make` and the `bg_core` engine directly (no subprocess per track).
+A failed job is reported and the batch keeps going.
+
+Manifest (JSON):
+  {
+    "out": "out",
+    "workers": 4,
+    "defaults": {"amp": 0.35, "iso_carrier": 400, "mode": "iso", "artist": "TamerOnLine", "format": "flac"},
+    "bands": {"delta": 90, "theta": 45},
+    "jobs": [
+      {"kind": "tone", "band": "delta", "freqs": [0.5, 1, 2, 3]},
+      {"kind": "bg", "name": "sea", "minutes": 480, "seed": 42, "loop": 120}
+    ]
+  }
+
+Example:
+  python batch.py manifest.json --workers 8
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# band / name end up in file and directory names
+_SAFE_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def _safe_name(value, what: str) -> str:
+    value = str(value)
+    if not _SAFE_NAME.fullmatch(value):
+        raise ValueError(f"{what} '{value}' may only contain letters, digits, '_' and '-'")
+    return value
+
+
+def expand_manifest(manifest: dict) -> list[dict]:
+    """Flatten a manifest into one job dict per output file."""
+    out_root = Path(manifest.get("out", "out"))
+    defaults = dict(manifest.get("defaults", {}))
+    bands = manifest.get("bands", {})
+    jobs = []
+    for entry in manifest.get("jobs", []):
+        spec = {**defaults, **entry}
+        kind = spec.get("kind", "tone")
+        if kind == "tone":
+            band = spec.get("band", "")
+            if band:
+                band = _safe_name(band, "band")
+            minutes = float(spec.get("minutes", bands.get(band, 30.0)))
+            mode = spec.get("mode", "iso")
+            out_dir = Path(spec.get("out", out_root / band if band else out_root))
+            freqs = spec.get("freqs", [spec.get("freq", 4.0)])
+            for hz in freqs:
+                job = {**spec, "kind": "tone", "freq": float(hz), "minutes": minutes, "mode": mode}
+                job.pop("freqs", None)
+                stem = f"{band}_{hz:g}hz" if band else f"{hz:g}hz"
+                job["name"] = f"{stem}_{mode}"
+                job["out_dir"] = str(out_dir)
+                job["stem"] = stem
+                jobs.append(job)
+        elif kind == "bg":
+            name = _safe_name(spec["name"], "name")
+            minutes = float(spec.get("minutes", 5.0))
+            job = {**spec, "minutes": minutes, "profile": name}
+            job["out_dir"] = str(spec.get("out", out_root / name))
+            job["stem"] = f"{name}_{minutes:g}m"
+            job["name"] = job["stem"]
+            jobs.append(job)
+        else:
+            raise ValueError(f"Unknown job kind '{kind}' (expected 'tone' or 'bg')")
+    return jobs
+
+
+def _meta(job: dict, title: str, comment: str) -> dict:
+    prefix = job.get("title_prefix", "")
+    return dict(
+        title=f"{prefix} {title}".strip(),
+        artist=job.get("artist", ""),
+        comment=comment,
+        year=str(job.get("year", "")),
+        copyright_=job.get("copyright", ""),
+        url=job.get("url", ""),
+        email=job.get("email", ""),
+        artwork_path=job.get("artwork", ""),
+    )
+
+
+def _outputs(job: dict) -> list[Path]:
+    out_dir = Path(job["out_dir"])
+    ext = job.get("format", "wav")
+    if job["kind"] == "bg":
+        return [out_dir / f"{job['stem']}.{ext}"]
+    modes = ("binaural", "iso") if job["mode"] == "both" else (job["mode"],)
+    return [out_dir / f"{job['stem']}_{m}.{ext}" for m in modes]
+
+
+def _render_tone(job: dict, paths: dict[str, Path]) -> None:
+    from sound import track_metadata, write_tones
+
+    labels = {"binaural": "Binaural", "iso": "Isochronic"}
+    fmt = job.get("format", "wav")
+    write_tones(
+        {mode: str(p) for mode, p in paths.items()},
+        beat_hz=float(job["freq"]),
+        duration_sec=int(float(job["minutes"]) * 60),
+        sr=int(job.get("sr", 44100)),
+        binaural_carriers=tuple(float(c) for c in job.get("binaural", (220.0, 224.0))),
+        iso_carrier=float(job.get("iso_carrier", 400.0)),
+        amp=float(job.get("amp", 0.3)),
+        metadata={mode: track_metadata(fmt, **_meta(job, f"{job['freq']:g} Hz {labels[mode]}",
+                                                     "Generated by music4hz"))
+                  for mode in paths},
+        fmt=fmt,
+    )
+
+
+def _render_bg(job: dict, path: Path) -> None:
+    from bg_utils import SR
+    from bg_core.engine import stream_loop, stream_normalized
+    from sound import open_writer, track_metadata
+
+    profile = Path(job.get("profiles_dir", "profiles")) / f"{job['profile']}.json"
+    if not profile.exists():
+        raise FileNotFoundError(f"Profile not found: {profile}")
+    seed = job.get("seed")
+    level = job.get("level")
+    seed = None if seed is None else int(seed)
+    level = None if level is None else float(level)
+    if float(job.get("loop", 0)) > 0:
+        blocks = stream_loop(str(profile), float(job["minutes"]), loop_sec=float(job["loop"]),
+                             seed=seed, level=level)
+    else:
+        blocks = stream_normalized(str(profile), float(job["minutes"]), seed=seed, level=level)
+    fmt = job.get("format", "wav")
+    meta = track_metadata(fmt, **_meta(job, f"{job['profile']} {job['minutes']:g}m", "Generated by music4hz (ambient)"))
+    with open_writer(str(path), SR, 2, fmt=fmt, metadata=meta) as wf:
+        for blk in blocks:
+            wf.write(blk)
+
+
+def render_job(job: dict) -> dict:
+    """Render one job in the current process -> result dict (never raises).
+
+    Outputs are written to "<name>.part" files and renamed into place only
+    once every one of them is complete, so a failed or interrupted job
+    never leaves a truncated file that a later run would skip.
+    """
+    t0 = time.perf_counter()
+    outputs = _outputs(job)
+    parts = {p: p.with_name(p.name + ".part") for p in outputs}
+    try:
+        Path(job["out_dir"]).mkdir(parents=True, exist_ok=True)
+        if job["kind"] == "bg":
+            _render_bg(job, parts[outputs[0]])
+        else:
+            _render_tone(job, {p.stem.rsplit("_", 1)[-1]: part for p, part in parts.items()})
+        for p, part in parts.items():
+            os.replace(part, p)
+        return {"name": job["name"], "ok": True, "outputs": [str(p) for p in outputs],
+                "seconds": time.perf_counter() - t0}
+    except Exception as e:
+        return {"name": job["name"], "ok": False, "error": f"{type(e).__name__}: {e}",
+                "seconds": time.perf_counter() - t0}
+    finally:
+        for part in parts.values():
+            part.unlink(missing_ok=True)
+
+
+def run_batch(jobs: list[dict], *, workers: int | None = None, skip_existing: bool = True) -> list[dict]:
+    """Render jobs on a process pool; keep going after failures and report per-job timing."""
+    todo = []
+    for job in jobs:
+        if skip_existing and all(p.exists() for p in _outputs(job)):
+            print(f"!! Skipping {job['name']} (already exists)")
+            continue
+        todo.append(job)
+
+    workers = workers or os.cpu_count() or 1
+    results = []
+    t0 = time.perf_counter()
+    if workers <= 1 or len(todo) <= 1:
+        for job in todo:
+            print(f">> Generating {job['name']} ...")
+            results.append(_report(render_job(job)))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            futures = {pool.submit(render_job, job): job for job in todo}
+            for fut in as_completed(futures):
+                try:
+                    result = fut.result()
+                except Exception as e:  # worker died (OOM, segfault): BrokenProcessPool
+                    result = {"name": futures[fut]["name"], "ok": False,
+                              "error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+                results.append(_report(result))
+
+    failed = [r for r in results if not r["ok"]]
+    print(f"\nBatch: {len(results) - len(failed)} ok, {len(failed)} failed, "
+          f"{time.perf_counter() - t0:.1f}s wall ({workers} worker(s))")
+    return results
+
+
+def _report(result: dict) -> dict:
+    if result["ok"]:
+        print(f"✓ {result['name']} ({result['seconds']:.1f}s)")
+    else:
+        print(f"!! Failed: {result['name']} ({result['seconds']:.1f}s) — {result['error']}")
+    return result
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="music4hz - parallel batch renderer")
+    p.add_argument("manifest", help="JSON job manifest")
+    p.add_argument("--workers", type=int, default=0, help="Worker processes (0 = manifest / CPU count)")
+    p.add_argument("--force", action="store_true", help="Re-render files that already exist")
+    p.add_argument("--report", default="", help="Write per-job results as JSON to this path")
+    args = p.parse_args()
+
+    manifest = json.loads(Path(args.manifest).read_text(encoding="utf-8"))
+    jobs = expand_manifest(manifest)
+    workers = args.workers or int(manifest.get("workers", 0)) or None
+    results = run_batch(jobs, workers=workers, skip_existing=not args.force)
+    if args.report:
+        Path(args.report).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 1 if any(not r["ok"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,304 @@
+"""
+music4hz — render benchmark suite
+
+Times every bg_core operator, the bg_utils filter / noise primitives, a full
+run_profile for each file in profiles/, sound.make, the WAV writer +
+metadata and the FLAC encoder, over a sweep of track durations. Each case runs in a fresh worker
+process so its peak RSS is its own.
+
+Reports samples/second, realtime factor (audio seconds per wall second) and
+peak RSS; results can be saved as a JSON baseline and compared against one.
+
+Examples:
+  python bench.py                                  # full sweep, table to stdout
+  python bench.py --durations 10,60 --only profile
+  python bench.py --save bench/baseline.json
+  python bench.py --compare bench/baseline.json --tolerance 0.2   # exit 1 on regression
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+BASE = Path(__file__).resolve().parent
+DEFAULT_DURATIONS = (10.0, 60.0)
+QUICK_DURATIONS = (5.0,)
+
+
+# ---------------- cases ----------------
+# Each case: fn(duration_sec) -> frames rendered (at SR)
+
+def _op_case(name: str) -> Callable[[float], int]:
+    def run(duration: float) -> int:
+        from bg_utils import SR, pink_noise
+        from bg_core.arena import Arena
+        from bg_core.engine import BLOCK
+        from bg_core.registry import get_processor
+
+        n = int(duration * SR)
+        state = {"SR": SR, "seed": 1, "n": n, "arena": Arena()}
+        proc = get_processor(name)(state=state)
+        # pink input so filters and envelopes see realistic data
+        src = pink_noise(BLOCK, np.random.default_rng(0))
+        x = np.empty(BLOCK, dtype=np.float32)
+        for s in range(0, n, BLOCK):
+            m = min(BLOCK, n - s)
+            x[:m] = src[:m]
+            proc(x[:m])
+        return n
+    return run
+
+
+def _primitive_cases() -> Dict[str, Callable[[float], int]]:
+    import bg_utils as bu
+
+    def blocks(duration, fn, block=1 << 16):
+        n = int(duration * bu.SR)
+        x = bu.pink_noise(block, np.random.default_rng(0))
+        for s in range(0, n, block):
+            fn(x[:min(block, n - s)])
+        return n
+
+    def pink(method):
+        def run(duration):
+            n = int(duration * bu.SR)
+            noise = bu.pink_stream(np.random.SeedSequence(1), method, n)
+            for s in range(0, n, 1 << 16):
+                noise(min(1 << 16, n - s))
+            return n
+        return run
+
+    def lowpass(duration):
+        f = bu.OnePoleLowpass(300.0)
+        return blocks(duration, f)
+
+    def highpass(duration):
+        f = bu.OnePoleHighpass(2000.0)
+        return blocks(duration, f)
+
+    def lfo(duration):
+        n = int(duration * bu.SR)
+        out = np.empty(1 << 16, dtype=np.float32)
+        for s in range(0, n, 1 << 16):
+            m = min(1 << 16, n - s)
+            bu.lfo_sine(m, 0.1, start=s, out=out[:m])
+        return n
+
+    def lfo_kr(duration):
+        n = int(duration * bu.SR)
+        out = np.empty(1 << 16, dtype=np.float32)
+        for s in range(0, n, 1 << 16):
+            m = min(1 << 16, n - s)
+            bu.lfo_sine_kr(m, 0.1, start=s, out=out[:m])
+        return n
+
+    def normalize(duration):
+        n = int(duration * bu.SR)
+        bu.stereo_normalize(np.random.default_rng(0).standard_normal((n, 2)).astype(np.float32), 0.2)
+        return n
+
+    return {
+        "bg_utils.pink[kellet]": pink("kellet"),
+        "bg_utils.pink[voss]": pink("voss"),
+        "bg_utils.pink[fft]": pink("fft"),
+        "bg_utils.OnePoleLowpass": lowpass,
+        "bg_utils.OnePoleHighpass": highpass,
+        "bg_utils.lfo_sine": lfo,
+        "bg_utils.lfo_sine_kr": lfo_kr,
+        "bg_utils.stereo_normalize": normalize,
+    }
+
+
+def _profile_case(path: str) -> Callable[[float], int]:
+    def run(duration: float) -> int:
+        from bg_utils import SR
+        from bg_core.engine import run_profile
+
+        run_profile(path, duration / 60.0, seed=1)
+        return int(duration * SR)
+    return run
+
+
+def _make_case(mode: str) -> Callable[[float], int]:
+    def run(duration: float) -> int:
+        from sound import make
+
+        make(4.0, duration, 44100, modes=(mode,))
+        return int(duration * 44100)
+    return run
+
+
+def _wav_case(duration: float) -> int:
+    from sound import save_wav, wav_metadata
+
+    n = int(duration * 44100)
+    data = (np.random.default_rng(0).standard_normal((n, 2)) * 0.1).astype(np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.wav")
+        artwork = BASE / "image" / "logo.png"
+        meta = wav_metadata(title="bench", artist="music4hz", comment="bench",
+                            artwork_path=str(artwork) if artwork.exists() else "")
+        save_wav(path, data, 44100, metadata=meta)
+    return n
+
+
+def _flac_case(duration: float) -> int:
+    from sound import open_writer
+
+    n = int(duration * 44100)
+    t = np.arange(n) / 44100.0
+    data = (0.3 * np.sin(2 * np.pi * 220.0 * t)[:, None] * np.ones(2)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        with open_writer(os.path.join(tmp, "bench.flac"), 44100, 2, fmt="flac") as wf:
+            wf.write(data)
+    return n
+
+
+def build_cases(profiles_dir: str = "profiles") -> List[Tuple[str, str, Callable[[float], int]]]:
+    """(group, name, fn) for every benchmark case."""
+    from bg_core.registry import _OPS
+
+    cases = [("op", f"op.{name}", _op_case(name)) for name in sorted(_OPS)]
+    cases += [("primitive", name, fn) for name, fn in _primitive_cases().items()]
+    for path in sorted(Path(profiles_dir).glob("*.json")):
+        cases.append(("profile", f"profile.{path.stem}", _profile_case(str(path))))
+    cases += [("tone", f"sound.make[{m}]", _make_case(m)) for m in ("binaural", "iso")]
+    cases.append(("writer", "save_wav+metadata", _wav_case))
+    cases.append(("writer", "flac_writer", _flac_case))
+    return cases
+
+
+# ---------------- runner ----------------
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def _run_case(profiles_dir: str, name: str, duration: float, repeat: int) -> dict:
+    # Runs inside a fresh worker process
+    fn = {n: f for _, n, f in build_cases(profiles_dir)}[name]
+    best = float("inf")
+    frames = 0
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        frames = fn(duration)
+        best = min(best, time.perf_counter() - t0)
+    return {"seconds": best, "frames": frames, "peak_rss_mb": _peak_rss_mb()}
+
+
+def run_benchmarks(durations, *, only: str = "", repeat: int = 1, profiles_dir: str = "profiles",
+                   isolate: bool = True) -> List[dict]:
+    from bg_utils import SR
+
+    results = []
+    for group, name, _ in build_cases(profiles_dir):
+        if only and only not in name and only != group:
+            continue
+        for duration in durations:
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    r = pool.submit(_run_case, profiles_dir, name, duration, repeat).result()
+            else:
+                r = _run_case(profiles_dir, name, duration, repeat)
+            sec = max(r["seconds"], 1e-9)
+            row = {
+                "group": group,
+                "case": name,
+                "duration_sec": duration,
+                "frames": r["frames"],
+                "seconds": round(r["seconds"], 6),
+                "samples_per_sec": r["frames"] / sec,
+                "realtime_x": (r["frames"] / SR) / sec,
+                "peak_rss_mb": r["peak_rss_mb"],
+            }
+            results.append(row)
+            _print_row(row)
+    return results
+
+
+def _print_row(row: dict) -> None:
+    rss = f"{row['peak_rss_mb']:8.1f}" if row["peak_rss_mb"] is not None else "       -"
+    print(f"{row['case']:<28} {row['duration_sec']:>7g}s {row['seconds']:>9.3f}s "
+          f"{row['samples_per_sec'] / 1e6:>8.2f} MS/s {row['realtime_x']:>9.0f}x {rss} MB", flush=True)
+
+
+def _meta() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """Cases whose samples/second fell more than tolerance below the baseline."""
+    base = {(r["case"], r["duration_sec"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        b = base.get((r["case"], r["duration_sec"]))
+        if b is None or b["samples_per_sec"] <= 0:
+            continue
+        ratio = r["samples_per_sec"] / b["samples_per_sec"]
+        if ratio < 1.0 - tolerance:
+            regressions.append(f"{r['case']} @ {r['duration_sec']:g}s: {ratio:.2f}x of baseline")
+    return regressions
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="music4hz - render benchmarks")
+    p.add_argument("--durations", default="", help="Comma-separated track durations in seconds (default 10,60)")
+    p.add_argument("--quick", action="store_true", help="Short 5 s sweep (smoke test)")
+    p.add_argument("--only", default="", help="Run cases whose name contains this text (or a group name)")
+    p.add_argument("--repeat", type=int, default=1, help="Best of N runs per case")
+    p.add_argument("--profiles-dir", default="profiles")
+    p.add_argument("--no-isolate", action="store_true", help="Run in this process (peak RSS is then cumulative)")
+    p.add_argument("--save", default="", help="Write results as a JSON baseline")
+    p.add_argument("--compare", default="", help="Baseline JSON to check for regressions")
+    p.add_argument("--tolerance", type=float, default=0.15, help="Allowed samples/s drop vs baseline (fraction)")
+    args = p.parse_args()
+
+    if args.durations:
+        durations = tuple(float(d) for d in args.durations.split(",") if d)
+    else:
+        durations = QUICK_DURATIONS if args.quick else DEFAULT_DURATIONS
+
+    print(f"{'case':<28} {'audio':>8} {'wall':>10} {'throughput':>13} {'realtime':>10} {'peak RSS':>11}")
+    results = run_benchmarks(durations, only=args.only, repeat=args.repeat,
+                             profiles_dir=args.profiles_dir, isolate=not args.no_isolate)
+    report = {"meta": _meta(), "results": results}
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"✓ Saved baseline: {args.save}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"!! Regression: {line}")
+        if regressions:
+            return 1
+        print(f"✓ No regressions beyond {args.tolerance:.0%} vs {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,31 @@
+# bg_core/arena.py
+from __future__ import annotations
+import numpy as np
+
+class Arena:
+    """Named scratch buffers reused across blocks for one render (engine state["arena"]).
+
+    get() hands out a view of a buffer that only grows, so a whole profile
+    render works in a fixed set of allocations.
+    """
+
+    def __init__(self):
+        self._bufs = {}
+
+    def get(self, key, shape, dtype=np.float32) -> np.ndarray:
+        shape = tuple(int(s) for s in shape)
+        size = int(np.prod(shape))
+        buf = self._bufs.get(key)
+        if buf is None or buf.dtype != np.dtype(dtype) or buf.size < size:
+            buf = np.empty(size, dtype=dtype)
+            self._bufs[key] = buf
+        return buf[:size].reshape(shape)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.nbytes for b in self._bufs.values())
+
+def arena_of(state: dict) -> Arena:
+    """The render's shared arena, or a private one for one-off process() calls."""
+    arena = state.get("arena")
+    return arena if arena is not None else Arena()
@@ -1,42 +1,230 @@
 # bg_core/engine.py
 from __future__ import annotations
 from pathlib import Path
+from collections import deque
+import copy
+from contextlib import nullcontext
 import json
 import numpy as np
 from bg_utils import SR, stereo_normalize
-from .registry import get_op
-
-def _parse_step(step: str):
-    # "op:arg1=val1,arg2=val2" -> ("op", {"arg1":val1,...})
-    if ":" not in step:
-        return step.strip(), {}
-    name, argstr = step.split(":", 1)
-    args = {}
-    for p in argstr.split(","):
-        if not p:
+from .arena import Arena
+from .graph import compile_pipeline, parse_step, run_nodes
+
+# Samples per streamed block (~1.5 s @ 44.1 kHz)
+BLOCK = 1 << 16
+
+# Samples rendered ahead of the emitted block by stream_lookahead (~3 s)
+LOOKAHEAD = 2 * BLOCK
+
+# Kept for callers of the old private helper
+_parse_step = parse_step
+
+# Parsed profiles keyed on (path, mtime, size): long-lived processes skip re-reading them
+_PROFILES: dict = {}
+
+def _stage(telemetry, name: str, frames: int = 0):
+    """telemetry.stage(...) or a no-op context when telemetry is off."""
+    return telemetry.stage(name, frames) if telemetry is not None else nullcontext()
+
+def load_profile(profile_path: str) -> dict:
+    """Read a JSON profile -> dict with "level" and "pipeline"."""
+    path = Path(profile_path)
+    st = path.stat()
+    key = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+    cfg = _PROFILES.get(key)
+    if cfg is None:
+        cfg = json.loads(path.read_text(encoding="utf-8"))
+        _PROFILES[key] = cfg
+    return copy.deepcopy(cfg)
+
+def _run_pipeline(steps, n: int, state: dict, block: int = BLOCK):
+    # Compile once; every block runs in the arena's preallocated buffers.
+    # Yielded blocks are reused: consume (or copy) each one before advancing.
+    arena = state.setdefault("arena", Arena())
+    with _stage(state.get("telemetry"), "parse"):
+        nodes = compile_pipeline(steps, state)
+    for start in range(0, n, int(block)):
+        m = min(int(block), n - start)
+        x = arena.get("engine.block", (m,))
+        x.fill(0.0)
+        x = run_nodes(nodes, x)
+        if x.ndim == 1:
+            st = arena.get("engine.stereo", (m, 2))
+            st[:, 0] = x
+            st[:, 1] = x
+            x = st
+        yield x
+
+def stream_profile(profile_path: str, minutes: float, *, seed: int | None = None, block: int = BLOCK,
+                   telemetry=None):
+    """Run the profile pipeline block by block -> yield raw (un-normalized) stereo float32 blocks.
+
+    Each operator keeps its own state (filter memory, LFO phase, RNG stream,
+    pending burst tails) across blocks, so memory stays constant whatever the
+    track length. Blocks are reused buffers: copy them if you keep them.
+    A bg_core.telemetry.Telemetry records per-step timings.
+    """
+    cfg = load_profile(profile_path)
+    n = int(minutes * 60 * SR)
+    state = {"SR": SR, "seed": seed, "n": n, "telemetry": telemetry}
+    yield from _run_pipeline(cfg.get("pipeline", []), n, state, block)
+
+def resolve_seed(seed: int | None) -> int:
+    """Return seed, or draw a fresh one so repeated passes render the same signal."""
+    if seed is not None:
+        return int(seed)
+    return int(np.random.SeedSequence().entropy)
+
+def profile_level(cfg: dict, level: float | None = None) -> float:
+    """Target peak level: explicit override, else the profile's "level" field."""
+    return float(cfg.get("level", 0.2)) if level is None else float(level)
+
+def scan_peak(profile_path: str, minutes: float, *, seed: int, block: int = BLOCK, telemetry=None) -> float:
+    """First pass: render the stream and keep only its absolute peak."""
+    peak = 0.0
+    for blk in stream_profile(profile_path, minutes, seed=seed, block=block, telemetry=telemetry):
+        if blk.size:
+            with _stage(telemetry, "peak_scan", blk.shape[0]):
+                peak = max(peak, float(np.max(np.abs(blk))))
+    return peak
+
+def stream_normalized(profile_path: str, minutes: float, *, seed: int | None = None,
+                      level: float | None = None, block: int = BLOCK, telemetry=None):
+    """Two-pass streaming render -> yield stereo float32 blocks peaking at the target level.
+
+    Pass 1 scans the peak, pass 2 deterministically re-renders with the same
+    seed and scales each block, so the full track is never held in memory.
+    """
+    seed = resolve_seed(seed)
+    target = profile_level(load_profile(profile_path), level)
+    peak = scan_peak(profile_path, minutes, seed=seed, block=block, telemetry=telemetry)
+    scale = np.float32(target / peak) if peak > 0 else np.float32(1.0)
+    for blk in stream_profile(profile_path, minutes, seed=seed, block=block, telemetry=telemetry):
+        with _stage(telemetry, "normalize", blk.shape[0]):
+            blk *= scale
+        yield blk
+
+def lookahead_gain(blocks, target: float, *, lookahead: int = LOOKAHEAD, telemetry=None):
+    """Scale raw stereo blocks to the target peak with bounded latency -> yield float32 blocks.
+
+    A block is emitted once at least lookahead samples past it have been
+    rendered; its gain is target / (largest peak so far, look-ahead included).
+    The gain only falls and ramps linearly across the emitted block, so no
+    sample exceeds the target and there are no steps. Once the loudest
+    moment has been seen the gain equals the two-pass normalization.
+    """
+    queue, queued = deque(), 0
+    peak, gain = 0.0, None
+    lookahead = max(1, int(lookahead))
+
+    def emit():
+        nonlocal queued, gain
+        blk = queue.popleft()
+        queued -= blk.shape[0]
+        g1 = target / peak if peak > 0 else 1.0
+        g0 = g1 if gain is None else gain
+        with _stage(telemetry, "normalize", blk.shape[0]):
+            if g0 == g1:
+                blk *= np.float32(g1)
+            else:
+                blk *= np.linspace(g0, g1, blk.shape[0], endpoint=False, dtype=np.float32)[:, None]
+        gain = g1
+        return blk
+
+    for blk in blocks:
+        if not blk.size:
             continue
-        k, v = p.split("=")
-        try:
-            args[k] = float(v)
-        except ValueError:
-            args[k] = v
-    return name.strip(), args
-
-def run_profile(profile_path: str, minutes: float, *, seed: int | None = None, level: float | None = None):
-    """Load JSON profile and run its pipeline -> return stereo float32 @ SR."""
-    cfg = json.loads(Path(profile_path).read_text(encoding="utf-8"))
-    steps = cfg.get("pipeline", [])
-    target = float(cfg.get("level", 0.2)) if level is None else float(level)
+        blk = blk.copy()  # engine blocks are reused buffers
+        peak = max(peak, float(np.max(np.abs(blk))))
+        queue.append(blk)
+        queued += blk.shape[0]
+        while queued - queue[0].shape[0] >= lookahead:
+            yield emit()
+    while queue:
+        yield emit()
+
+def stream_lookahead(profile_path: str, minutes: float, *, seed: int | None = None, level: float | None = None,
+                     workers: int = 0, block: int = BLOCK, lookahead: int = LOOKAHEAD, telemetry=None):
+    """One-pass streaming render for live output -> yield stereo float32 blocks.
+
+    Unlike stream_normalized there is no peak pre-scan: the first block
+    leaves after about lookahead samples (lookahead_gain). workers > 0 renders
+    the raw stream with bg_core.parallel.stream_segments.
+    """
+    seed = resolve_seed(seed)
+    target = profile_level(load_profile(profile_path), level)
+    if workers:
+        from .parallel import stream_segments
+        raw = stream_segments(profile_path, minutes, seed=seed, workers=workers, block=block)
+    else:
+        raw = stream_profile(profile_path, minutes, seed=seed, block=block, telemetry=telemetry)
+    yield from lookahead_gain(raw, target, lookahead=lookahead, telemetry=telemetry)
+
+def run_profile(profile_path: str, minutes: float, *, seed: int | None = None, level: float | None = None,
+                workers: int = 0, telemetry=None):
+    """Load JSON profile and run its pipeline -> return stereo float32 @ SR.
+
+    workers > 0 switches to the segment-parallel renderer (bg_core.parallel):
+    block-aligned chunks on a process pool, each warmed up over a short lead-in
+    (telemetry is not collected from worker processes).
+    """
+    if workers:
+        from .parallel import render_parallel
+        return render_parallel(profile_path, minutes, seed=seed, level=level, workers=workers)
+    target = profile_level(load_profile(profile_path), level)
 
     n = int(minutes * 60 * SR)
-    x = np.zeros(n, dtype=np.float32)
-    state = {"SR": SR, "seed": seed}
+    out = np.zeros((n, 2), dtype=np.float32)
+    pos = 0
+    for blk in stream_profile(profile_path, minutes, seed=seed, telemetry=telemetry):
+        out[pos:pos + blk.shape[0]] = blk
+        pos += blk.shape[0]
+    with _stage(telemetry, "normalize", n):
+        return stereo_normalize(out, target)
+
+def render_loop(profile_path: str, loop_sec: float, *, seed: int | None = None,
+                level: float | None = None, xfade_sec: float = 2.0, block: int = BLOCK, telemetry=None):
+    """Render a seamless, normalized stereo loop of loop_sec seconds.
+
+    LFO-driven ops snap their rates to whole cycles per loop (state["loop_n"]),
+    an extra xfade_sec tail is rendered and equal-power crossfaded over the
+    head, so repeating the loop is continuous in both signal and modulation.
+    """
+    cfg = load_profile(profile_path)
+    target = profile_level(cfg, level)
+    L = int(loop_sec * SR)
+    X = min(int(xfade_sec * SR), L)
+    if L <= 0:
+        raise ValueError("loop_sec must be positive")
+    state = {"SR": SR, "seed": seed, "n": L + X, "loop_n": L, "telemetry": telemetry}
 
-    for step in steps:
-        name, kwargs = _parse_step(step)
-        op = get_op(name)
-        x = op(x, state=state, **kwargs)
+    y = np.empty((L + X, 2), dtype=np.float32)
+    pos = 0
+    for blk in _run_pipeline(cfg.get("pipeline", []), L + X, state, block):
+        y[pos:pos + blk.shape[0]] = blk
+        pos += blk.shape[0]
 
-    if x.ndim == 1:
-        x = np.stack([x, x], axis=1)
-    return stereo_normalize(x, target)
+    loop = y[:L]
+    if X > 0:
+        # head fades in while the continuation past the seam (same LFO phase) fades out
+        w = (np.arange(X, dtype=np.float64) + 0.5) / X * (np.pi / 2)
+        fade_in = np.sin(w).astype(np.float32)[:, None]
+        fade_out = np.cos(w).astype(np.float32)[:, None]
+        loop[:X] = loop[:X] * fade_in + y[L:L + X] * fade_out
+    with _stage(telemetry, "normalize", L):
+        return stereo_normalize(np.ascontiguousarray(loop), target)
+
+def stream_loop(profile_path: str, minutes: float, *, loop_sec: float, seed: int | None = None,
+                level: float | None = None, xfade_sec: float = 2.0, block: int = BLOCK, telemetry=None):
+    """Yield normalized stereo blocks by repeating a seamless loop for the whole track.
+
+    Render time scales with loop_sec instead of the track length.
+    """
+    loop = render_loop(profile_path, loop_sec, seed=seed, level=level, xfade_sec=xfade_sec, block=block,
+                       telemetry=telemetry)
+    L = loop.shape[0]
+    n = int(minutes * 60 * SR)
+    for start in range(0, n, int(block)):
+        m = min(int(block), n - start)
+        idx = (np.arange(start, start + m) % L)
+        yield loop[idx]
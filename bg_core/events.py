@@ -0,0 +1,155 @@
+# bg_core/events.py
+from __future__ import annotations
+import numpy as np
+from bg_utils import SR, one_pole_lowpass
+
+# Samples per decay kernel in the lookup table (linear interpolation between them)
+KERNEL_RES = 1024
+
+def _kernel_linear(t):
+    return 1.0 - t
+
+def _kernel_exp(t):
+    # ~-60 dB at the end of the event
+    return np.exp(-6.9 * t)
+
+def _kernel_click(t):
+    # very fast attack then steep decay: crackle / pops
+    return np.exp(-14.0 * t) * (1.0 - t)
+
+def _kernel_drip(t):
+    # short swell into a ringing decay: water drops
+    return np.sin(np.pi * np.minimum(t * 8.0, 1.0) / 2.0) * np.exp(-5.0 * t)
+
+def _kernel_rumble(t):
+    # slow swell, long tail: thunder
+    return np.minimum(t * 6.0, 1.0) ** 2 * np.exp(-4.0 * t)
+
+KERNELS = {
+    "linear": _kernel_linear,
+    "exp": _kernel_exp,
+    "click": _kernel_click,
+    "drip": _kernel_drip,
+    "rumble": _kernel_rumble,
+}
+KERNEL_IDS = {name: i for i, name in enumerate(KERNELS)}
+
+def _build_table(res: int = KERNEL_RES) -> np.ndarray:
+    t = np.linspace(0.0, 1.0, res, dtype=np.float64)
+    table = np.empty((len(KERNELS), res + 1), dtype=np.float64)
+    for i, fn in enumerate(KERNELS.values()):
+        table[i, :res] = fn(t)
+    table[:, res] = table[:, res - 1]  # guard for the frac=0 lookup at t == 1
+    return table
+
+KERNEL_TABLE = _build_table()
+_KERNEL_FLAT = KERNEL_TABLE.ravel()
+
+def kernel_id(name) -> int:
+    """Kernel name (or id) -> row of KERNEL_TABLE."""
+    if isinstance(name, (int, float, np.integer)):
+        return int(name)
+    if name not in KERNEL_IDS:
+        raise KeyError(f"Unknown event kernel '{name}'. Known: {', '.join(KERNEL_IDS)}")
+    return KERNEL_IDS[name]
+
+
+class EventTimeline:
+    """Sorted sparse events (onset, length, amplitude, kernel-id) rendered window by window.
+
+    Only events overlapping the requested window are touched, so the cost of
+    a block scales with the number of active events, not the track length.
+    Optional per-event fields: freq (Hz, the kernel then shapes a sine) and
+    offset (start index into a texture table passed to render()).
+    """
+
+    def __init__(self, onset, length, amp, kernel=0, *, freq=None, offset=None):
+        onset = np.asarray(onset, dtype=np.int64)
+        order = np.argsort(onset, kind="stable")
+
+        def field(v, dtype):
+            return np.broadcast_to(np.asarray(v, dtype=dtype), onset.shape)[order]
+
+        self.onset = onset[order]
+        self.length = field(length, np.int64)
+        self.amp = field(amp, np.float64)
+        self.kernel = field(kernel, np.int64)
+        self.freq = None if freq is None else field(freq, np.float64)
+        self.offset = None if offset is None else field(offset, np.int64)
+        self.max_len = int(self.length.max()) if self.length.size else 0
+
+    def __len__(self):
+        return int(self.onset.shape[0])
+
+    def render(self, start: int, out: np.ndarray, texture: np.ndarray | None = None) -> np.ndarray:
+        """Sum every event overlapping [start, start + len(out)) into out (overwritten).
+
+        With a texture table each event's kernel shapes texture[offset + j]
+        (wrapping), e.g. a precomputed noise grain.
+        """
+        m = out.shape[0]
+        end = start + m
+        lo = np.searchsorted(self.onset, start - self.max_len, side="left")
+        hi = np.searchsorted(self.onset, end, side="left")
+        p, n = self.onset[lo:hi], self.length[lo:hi]
+        a0 = np.maximum(p, start)
+        a1 = np.minimum(p + n, end)
+        live = a1 > a0
+        if not live.any():
+            out.fill(0.0)
+            return out
+        p, n, a0, a1 = p[live], n[live], a0[live], a1[live]
+        amp, kid = self.amp[lo:hi][live], self.kernel[lo:hi][live]
+
+        # Flatten every (event, sample) pair of the window into one index vector
+        counts = a1 - a0
+        first = np.cumsum(counts) - counts
+        ev = np.repeat(np.arange(counts.shape[0]), counts)
+        j = np.arange(int(counts.sum()), dtype=np.int64) - first[ev] + (a0 - p)[ev]
+
+        # Kernel lookup at t = j / (n - 1), linear interpolation in the table
+        denom = np.maximum(n - 1, 1)[ev]
+        u = j * ((KERNEL_RES - 1) / denom)
+        i0 = u.astype(np.int64)
+        frac = u - i0
+        i0 += (kid * KERNEL_TABLE.shape[1])[ev]
+        k0 = _KERNEL_FLAT[i0]
+        k1 = _KERNEL_FLAT[i0 + 1]
+        val = amp[ev] * (k0 + (k1 - k0) * frac)
+        if self.freq is not None:
+            val *= np.sin((2.0 * np.pi / SR) * self.freq[lo:hi][live][ev] * j)
+        if texture is not None:
+            off = self.offset[lo:hi][live] if self.offset is not None else np.zeros_like(p)
+            val *= texture[(off[ev] + j) % texture.shape[0]]
+
+        # Overlaps accumulate: bincount is a sorted-index np.add.at
+        dest = (p - start)[ev] + j
+        out[...] = np.bincount(dest, weights=val, minlength=m)
+        return out
+
+
+def noise_table(rng, size: int, cutoff: float | None = None) -> np.ndarray:
+    """Unit-RMS noise grain table for textured events (optionally low-passed)."""
+    t = rng.standard_normal(int(size)).astype(np.float32)
+    if cutoff:
+        t = one_pole_lowpass(t, float(cutoff))
+    t -= t.mean()
+    rms = float(np.sqrt(np.mean(t.astype(np.float64) ** 2)))
+    return (t / rms if rms > 0 else t).astype(np.float64)
+
+def event_count(density: float, n: int) -> int:
+    """Events per minute over n samples -> number of events to draw."""
+    return max(0, int(float(density) * (n / SR) / 60.0))
+
+def draw_events(rng, n: int, count: int, min_len: int, max_len: int, amp_lo: float, amp_hi: float,
+                kernel=0, tail: int = 0) -> EventTimeline:
+    """Draw count events in one call per field -> EventTimeline.
+
+    Onsets are uniform in [0, n - tail), lengths in [min_len, max_len),
+    amplitudes in [amp_lo, amp_hi).
+    """
+    count = max(0, int(count))
+    onset = rng.integers(0, max(1, n - tail), size=count)
+    length = rng.integers(min_len, max_len, size=count)
+    amp = rng.uniform(amp_lo, amp_hi, size=count)
+    return EventTimeline(onset, length, amp, kernel_id(kernel))
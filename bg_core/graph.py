@@ -0,0 +1,146 @@
+# bg_core/graph.py
+from __future__ import annotations
+import numpy as np
+from bg_utils import OnePoleBank, one_pole_parallel
+from .arena import arena_of
+from .registry import get_processor
+from .telemetry import Timed
+
+# Ops whose output is x + gain * response(x) for a linear, stateful response
+FILTER_OPS = frozenset({"filter_lp", "filter_hp", "filter_bp"})
+# Ops whose output is x * envelope(n)
+ENVELOPE_OPS = frozenset({"env_lfo"})
+
+def parse_step(step: str):
+    # "op:arg1=val1,arg2=val2" -> ("op", {"arg1":val1,...})
+    if ":" not in step:
+        return step.strip(), {}
+    name, argstr = step.split(":", 1)
+    args = {}
+    for p in argstr.split(","):
+        if not p:
+            continue
+        k, v = p.split("=")
+        try:
+            args[k] = float(v)
+        except ValueError:
+            args[k] = v
+    return name.strip(), args
+
+
+class Node:
+    """One stage of a compiled pipeline: kind, the (name, kwargs) steps it covers, and its processor."""
+
+    __slots__ = ("kind", "steps", "proc")
+
+    def __init__(self, kind: str, steps: list, proc):
+        self.kind = kind
+        self.steps = steps
+        self.proc = proc
+
+    def __repr__(self):
+        return f"Node({self.kind}: {' -> '.join(name for name, _ in self.steps)})"
+
+
+class FilterCascade:
+    """Adjacent linear filter ops merged into one multi-section pass.
+
+    Every filter op is x + gain * (sum of one-pole lowpasses of x), exposed by
+    its sections(). fuse() expands the product of the group's transfer
+    functions into partial fractions (bg_utils.one_pole_parallel), so all
+    one-pole sections run on the same input in one vectorized sweep per
+    chunk (bg_utils.OnePoleBank). Single filters, and groups with a repeated
+    pole (no such form), run stage by stage.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.bank = None
+
+    def fuse(self) -> None:
+        if len(self.stages) < 2 or not all(hasattr(stage, "sections") for stage in self.stages):
+            return
+        form = one_pole_parallel([stage.sections() for stage in self.stages])
+        if form is not None:
+            self.bank = OnePoleBank(*form)
+
+    def __call__(self, x, out=None):
+        if self.bank is not None:
+            return self.bank(x, out=out)
+        if out is not None and out is not x:
+            out[...] = x
+            x = out
+        for stage in self.stages:
+            x = stage(x, out=x)
+        return x
+
+
+class EnvelopeProduct:
+    """Consecutive envelope ops folded into a single multiply by the product envelope."""
+
+    def __init__(self, stages, arena):
+        self.stages = stages
+        self.arena = arena
+
+    def __call__(self, x, out=None):
+        n = x.shape[0]
+        env = self.stages[0].envelope(n, out=self.arena.get((self, "env"), (n,)))
+        tmp = self.arena.get((self, "tmp"), (n,))
+        for stage in self.stages[1:]:
+            env *= stage.envelope(n, out=tmp)
+        return np.multiply(x, env[:, None] if x.ndim == 2 else env, out=out)
+
+
+def _kind(name: str) -> str:
+    if name in FILTER_OPS:
+        return "filter"
+    if name in ENVELOPE_OPS:
+        return "envelope"
+    return "op"
+
+
+def compile_pipeline(steps, state: dict) -> list[Node]:
+    """Parse "op:k=v" steps once into a list of typed nodes.
+
+    Runs of filter ops are fused into one FilterCascade (one multi-section
+    pass) and runs of envelope ops into one EnvelopeProduct (a single
+    multiply). Other ops keep their own processor. With state["telemetry"]
+    every step is wrapped so its calls are timed; a filter group is timed as
+    a whole ("1:filter_lp+2:filter_bp").
+    """
+    arena = arena_of(state)
+    telemetry = state.get("telemetry")
+    parsed = [parse_step(s) for s in steps]
+    nodes: list[Node] = []
+    labels: list[list[str]] = []
+    for i, (name, kwargs) in enumerate(parsed):
+        kind = _kind(name)
+        # each step sees its own index/name so it can derive independent RNG streams
+        proc = get_processor(name)(state=dict(state, step=i, op=name), **kwargs)
+        if telemetry is not None and kind != "filter":
+            # timed per step, inside envelope products too
+            proc = Timed(proc, f"{i}:{name}", telemetry)
+        if kind != "op" and nodes and nodes[-1].kind == kind:
+            nodes[-1].steps.append((name, kwargs))
+            nodes[-1].proc.stages.append(proc)
+            labels[-1].append(f"{i}:{name}")
+            continue
+        if kind == "filter":
+            proc = FilterCascade([proc])
+        elif kind == "envelope":
+            proc = EnvelopeProduct([proc], arena)
+        nodes.append(Node(kind, [(name, kwargs)], proc))
+        labels.append([f"{i}:{name}"])
+    for node, label in zip(nodes, labels):
+        if node.kind == "filter":
+            node.proc.fuse()
+            if telemetry is not None:
+                node.proc = Timed(node.proc, "+".join(label), telemetry)
+    return nodes
+
+
+def run_nodes(nodes: list[Node], x: np.ndarray) -> np.ndarray:
+    """Push one block through the compiled pipeline, in place wherever the shape allows."""
+    for node in nodes:
+        x = node.proc(x, out=x)
+    return x
@@ -1,17 +1,44 @@
 import numpy as np
-from bg_utils import SR, one_pole_lowpass
+from bg_utils import SR, OnePoleLowpass
+from bg_core.arena import arena_of
+from bg_core.rng import op_rng
+from bg_core.events import draw_events, event_count
 
-def process(x, *, state, density: float = 20.0, min_ms: float = 40.0, max_ms: float = 200.0,
-            amp_lo: float = 0.2, amp_hi: float = 0.6, gain: float = 1.0, **_):
-    n = x.shape[0]
-    rng = np.random.default_rng(state.get("seed"))
-    out = np.zeros(n, dtype=np.float32)
-    total = int(float(density) * (n / SR) / 60.0)
-    for _ in range(max(0, total)):
-        pos = rng.integers(0, max(1, n - SR // 5))
-        L = rng.integers(int(SR * (min_ms / 1000.0)), int(SR * (max_ms / 1000.0)))
-        amp = rng.uniform(float(amp_lo), float(amp_hi))
-        out[pos:pos+L] += amp * np.linspace(1.0, 0.0, L, dtype=np.float32)
-    # high-pass بسيط لتمييز “النقر”
-    out = out - one_pole_lowpass(out, 2000.0)
-    return (x + out * float(gain)).astype(np.float32)
+class Processor:
+    def __init__(self, *, state, density: float = 20.0, min_ms: float = 40.0, max_ms: float = 200.0,
+                 amp_lo: float = 0.2, amp_hi: float = 0.6, gain: float = 1.0, kernel: str = "linear", **_):
+        self.rng = op_rng(state)
+        self.n = state.get("n")
+        self.density = float(density)
+        self.min_len = int(SR * (min_ms / 1000.0))
+        self.max_len = int(SR * (max_ms / 1000.0))
+        self.amp_lo, self.amp_hi = float(amp_lo), float(amp_hi)
+        self.gain = np.float32(gain)
+        self.kernel = kernel
+        self.arena = arena_of(state)
+        self.events = None
+        self.pos = int(state.get("start", 0))
+        # high-pass بسيط لتمييز “النقر”
+        self.lp = OnePoleLowpass(2000.0)
+
+    def _schedule(self, n):
+        # كل الأحداث تُسحب دفعة واحدة (مواضع/أطوال/شدة) ثم تُرسم حسب الدفعة الحالية
+        self.events = draw_events(self.rng, n, event_count(self.density, n), self.min_len, self.max_len,
+                                  self.amp_lo, self.amp_hi, kernel=self.kernel, tail=SR // 5)
+
+    def __call__(self, x, out=None):
+        m = x.shape[0]
+        if self.events is None:
+            self._schedule(self.n if self.n is not None else m)
+        end = self.pos + m
+        # الأحداث النشطة فقط (بما فيها ذيول الدفعة السابقة) تُجمع في مخزن الدفعة
+        ev = self.events.render(self.pos, self.arena.get((self, "events"), (m,)))
+        self.pos = end
+        ev -= self.lp(ev, out=self.arena.get((self, "lp"), (m,)))
+        ev *= self.gain
+        if x.ndim == 2:
+            ev = ev[:, None]
+        return np.add(x, ev, out=out)
+
+def process(x, *, state, **kwargs):
+    return Processor(state=state, **kwargs)(x)
@@ -0,0 +1,54 @@
+import numpy as np
+from bg_utils import SR, OnePoleLowpass
+from bg_core.arena import arena_of
+from bg_core.rng import op_rng
+from bg_core.events import EventTimeline, event_count, kernel_id, noise_table
+
+class Processor:
+    """Fire crackle: dense, very short noise clicks with occasional louder pops."""
+
+    def __init__(self, *, state, density: float = 240.0, min_ms: float = 1.0, max_ms: float = 6.0,
+                 amp_lo: float = 0.05, amp_hi: float = 0.5, pops: float = 6.0, pop_amp: float = 1.2,
+                 cut: float = 1200.0, gain: float = 1.0, **_):
+        self.rng = op_rng(state)
+        self.n = state.get("n")
+        self.density, self.pops = float(density), float(pops)
+        self.min_len = max(1, int(SR * (min_ms / 1000.0)))
+        self.max_len = max(self.min_len + 1, int(SR * (max_ms / 1000.0)))
+        self.amp_lo, self.amp_hi, self.pop_amp = float(amp_lo), float(amp_hi), float(pop_amp)
+        self.gain = np.float32(gain)
+        self.arena = arena_of(state)
+        self.texture = noise_table(self.rng, 1 << 14)
+        self.events = None
+        self.pos = int(state.get("start", 0))
+        # high-pass: الطقطقة بلا طنين منخفض
+        self.lp = OnePoleLowpass(float(cut))
+
+    def _schedule(self, n):
+        rng = self.rng
+        count = event_count(self.density, n)
+        big = event_count(self.pops, n)
+        total = count + big
+        onset = rng.integers(0, max(1, n - self.max_len * 4), size=total)
+        length = rng.integers(self.min_len, self.max_len, size=total)
+        amp = rng.uniform(self.amp_lo, self.amp_hi, size=total)
+        # pops: longer and louder than the background crackle
+        length[count:] *= 4
+        amp[count:] = self.pop_amp * rng.uniform(0.5, 1.0, size=big)
+        offset = rng.integers(0, self.texture.shape[0], size=total)
+        self.events = EventTimeline(onset, length, amp, kernel_id("click"), offset=offset)
+
+    def __call__(self, x, out=None):
+        m = x.shape[0]
+        if self.events is None:
+            self._schedule(self.n if self.n is not None else m)
+        ev = self.events.render(self.pos, self.arena.get((self, "events"), (m,)), self.texture)
+        self.pos += m
+        ev -= self.lp(ev, out=self.arena.get((self, "lp"), (m,)))
+        ev *= self.gain
+        if x.ndim == 2:
+            ev = ev[:, None]
+        return np.add(x, ev, out=out)
+
+def process(x, *, state, **kwargs):
+    return Processor(state=state, **kwargs)(x)
@@ -0,0 +1,47 @@
+import numpy as np
+from bg_utils import SR
+from bg_core.arena import arena_of
+from bg_core.rng import op_rng
+from bg_core.events import EventTimeline, event_count, kernel_id
+
+class Processor:
+    """Water drips: sparse pitched blips, each a short sine under the drip kernel."""
+
+    def __init__(self, *, state, density: float = 30.0, min_ms: float = 30.0, max_ms: float = 120.0,
+                 f_lo: float = 700.0, f_hi: float = 2400.0, amp_lo: float = 0.05, amp_hi: float = 0.3,
+                 gain: float = 1.0, **_):
+        self.rng = op_rng(state)
+        self.n = state.get("n")
+        self.density = float(density)
+        self.min_len = max(1, int(SR * (min_ms / 1000.0)))
+        self.max_len = max(self.min_len + 1, int(SR * (max_ms / 1000.0)))
+        self.f_lo, self.f_hi = float(f_lo), float(f_hi)
+        self.amp_lo, self.amp_hi = float(amp_lo), float(amp_hi)
+        self.gain = np.float32(gain)
+        self.arena = arena_of(state)
+        self.events = None
+        self.pos = int(state.get("start", 0))
+
+    def _schedule(self, n):
+        rng = self.rng
+        count = event_count(self.density, n)
+        onset = rng.integers(0, max(1, n - self.max_len), size=count)
+        length = rng.integers(self.min_len, self.max_len, size=count)
+        amp = rng.uniform(self.amp_lo, self.amp_hi, size=count)
+        # log-uniform pitch: small and large drops equally likely
+        freq = np.exp(rng.uniform(np.log(self.f_lo), np.log(self.f_hi), size=count))
+        self.events = EventTimeline(onset, length, amp, kernel_id("drip"), freq=freq)
+
+    def __call__(self, x, out=None):
+        m = x.shape[0]
+        if self.events is None:
+            self._schedule(self.n if self.n is not None else m)
+        ev = self.events.render(self.pos, self.arena.get((self, "events"), (m,)))
+        self.pos += m
+        ev *= self.gain
+        if x.ndim == 2:
+            ev = ev[:, None]
+        return np.add(x, ev, out=out)
+
+def process(x, *, state, **kwargs):
+    return Processor(state=state, **kwargs)(x)
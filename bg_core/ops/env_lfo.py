@@ -1,7 +1,28 @@
 import numpy as np
-from bg_utils import lfo_sine, SR
+from bg_utils import lfo_sine_kr, fit_loop_freq
+from bg_core.arena import arena_of
 
-def process(x, *, state, f: float = 0.1, depth: float = 0.5, bias: float = 0.5, **_):
-    n = x.shape[0]
-    env = bias + depth * lfo_sine(n, float(f))
-    return (x * env.astype(np.float32)).astype(np.float32)
+class Processor:
+    def __init__(self, *, state, f: float = 0.1, depth: float = 0.5, bias: float = 0.5, **_):
+        self.f = fit_loop_freq(float(f), state.get("loop_n"))
+        self.depth = np.float32(depth)
+        self.bias = np.float32(bias)
+        self.arena = arena_of(state)
+        self.pos = int(state.get("start", 0))
+
+    def envelope(self, n, out=None):
+        # slow modulation: evaluated at control rate and interpolated
+        env = lfo_sine_kr(n, self.f, start=self.pos, out=out)
+        env *= self.depth
+        env += self.bias
+        self.pos += n
+        return env
+
+    def __call__(self, x, out=None):
+        env = self.envelope(x.shape[0], out=self.arena.get((self, "env"), x.shape[:1]))
+        if x.ndim == 2:
+            env = env[:, None]
+        return np.multiply(x, env, out=out)
+
+def process(x, *, state, **kwargs):
+    return Processor(state=state, **kwargs)(x)
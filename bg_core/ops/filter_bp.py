@@ -1,6 +1,28 @@
 import numpy as np
-from bg_utils import one_pole_lowpass
+from bg_utils import OnePoleLowpass
+from bg_core.arena import arena_of
 
-def process(x, *, state, lo: float = 200.0, hi: float = 1500.0, gain: float = 1.0, **_):
-    bp = one_pole_lowpass(x, float(hi)) - one_pole_lowpass(x, float(lo))
-    return (x + bp * float(gain)).astype(np.float32)
+class Processor:
+    def __init__(self, *, state, lo: float = 200.0, hi: float = 1500.0, gain: float = 1.0, **_):
+        self.lp_hi = OnePoleLowpass(float(hi))
+        self.lp_lo = OnePoleLowpass(float(lo))
+        self.gain = np.float32(gain)
+        self.arena = arena_of(state)
+
+    def response(self, x, out=None):
+        r = self.lp_hi(x, out=out)
+        r -= self.lp_lo(x, out=self.arena.get((self, "lo"), x.shape))
+        return r
+
+    def sections(self):
+        # x + gain * (LP_hi(x) - LP_lo(x)), for bg_utils.one_pole_parallel
+        g = float(self.gain)
+        return 1.0, [(self.lp_hi.a, g), (self.lp_lo.a, -g)]
+
+    def __call__(self, x, out=None):
+        r = self.response(x, out=self.arena.get((self, "resp"), x.shape))
+        r *= self.gain
+        return np.add(x, r, out=out)
+
+def process(x, *, state, **kwargs):
+    return Processor(state=state, **kwargs)(x)
@@ -1,6 +1,25 @@
 import numpy as np
-from bg_utils import one_pole_lowpass
+from bg_utils import OnePoleLowpass
+from bg_core.arena import arena_of
 
-def process(x, *, state, cut: float = 1000.0, gain: float = 1.0, **_):
-    hp = x - one_pole_lowpass(x, float(cut))
-    return (x + hp * float(gain)).astype(np.float32)
+class Processor:
+    def __init__(self, *, state, cut: float = 1000.0, gain: float = 1.0, **_):
+        self.lp = OnePoleLowpass(float(cut))
+        self.gain = np.float32(gain)
+        self.arena = arena_of(state)
+
+    def response(self, x, out=None):
+        r = self.lp(x, out=out)
+        return np.subtract(x, r, out=r)
+
+    def sections(self):
+        # x + gain * (x - LP(x)), for bg_utils.one_pole_parallel
+        return 1.0 + float(self.gain), [(self.lp.a, -float(self.gain))]
+
+    def __call__(self, x, out=None):
+        r = self.response(x, out=self.arena.get((self, "resp"), x.shape))
+        r *= self.gain
+        return np.add(x, r, out=out)
+
+def process(x, *, state, **kwargs):
+    return Processor(state=state, **kwargs)(x)
@@ -0,0 +1,24 @@
+import numpy as np
+from bg_utils import SpectralNoise, spectral_shape
+from bg_core.arena import arena_of
+from bg_core.rng import noise_stream
+
+class Processor:
+    # eq uses "freq/dB;freq/dB" because profile arguments are split on ","
+    def __init__(self, *, state, color: str = "pink", slope=None, eq: str = "", gain: float = 1.0,
+                 fft: float = 4096, **_):
+        nfft = max(64, int(fft)) & ~1
+        mag = spectral_shape(nfft, str(color), None if slope is None else float(slope), eq)
+        self.noise = SpectralNoise(noise_stream(state), mag, int(state.get("start", 0)))
+        self.gain = np.float32(gain)
+        self.arena = arena_of(state)
+
+    def __call__(self, x, out=None):
+        base = self.noise(x.shape[0], out=self.arena.get((self, "noise"), x.shape[:1]))
+        base *= self.gain
+        if x.ndim == 2:
+            base = base[:, None]
+        return np.add(x, base, out=out)
+
+def process(x, *, state, **kwargs):
+    return Processor(state=state, **kwargs)(x)
@@ -1,8 +1,20 @@
 import numpy as np
-from bg_utils import pinkish
+from bg_utils import pink_stream
+from bg_core.arena import arena_of
+from bg_core.rng import op_seed
 
-def process(x, *, state, gain: float = 1.0, **_):
-    n = x.shape[0]
-    rng = np.random.default_rng(state.get("seed"))
-    base = pinkish(rng.standard_normal(n, dtype=np.float32))
-    return (x + base * float(gain)).astype(np.float32)
+class Processor:
+    def __init__(self, *, state, gain: float = 1.0, method: str = "kellet", **_):
+        self.noise = pink_stream(op_seed(state), str(method), state.get("n"), int(state.get("start", 0)))
+        self.gain = np.float32(gain)
+        self.arena = arena_of(state)
+
+    def __call__(self, x, out=None):
+        base = self.noise(x.shape[0], out=self.arena.get((self, "noise"), x.shape[:1]))
+        base *= self.gain
+        if x.ndim == 2:
+            base = base[:, None]
+        return np.add(x, base, out=out)
+
+def process(x, *, state, **kwargs):
+    return Processor(state=state, **kwargs)(x)
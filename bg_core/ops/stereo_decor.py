@@ -1,15 +1,47 @@
 import numpy as np
-from bg_utils import one_pole_lowpass, SR
-
-def process(x, *, state, spread: float = 0.02, pan_rate: float = 0.01, pan_depth: float = 0.1, **_):
-    if x.ndim == 2:
-        return x.astype(np.float32)
-    n = x.shape[0]
-    rng = np.random.default_rng(state.get("seed"))
-    decor = rng.standard_normal(n).astype(np.float32) * np.float32(spread)
-    decor = one_pole_lowpass(decor, 1200.0)
-    t = np.arange(n, dtype=np.float32) / np.float32(SR)
-    pan = np.sin(2*np.pi*pan_rate*t + rng.uniform(0, 2*np.pi)).astype(np.float32) * np.float32(pan_depth)
-    L = (x + 0.5*decor) * (1.0 + pan)
-    R = (x - 0.5*decor) * (1.0 - pan)
-    return np.stack([L, R], axis=1).astype(np.float32)
+from bg_utils import OnePoleLowpass, fit_loop_freq, lfo_sine_kr
+from bg_core.arena import arena_of
+from bg_core.rng import noise_stream, op_rng
+
+class Processor:
+    def __init__(self, *, state, spread: float = 0.02, pan_rate: float = 0.01, pan_depth: float = 0.1, **_):
+        self.spread = np.float32(spread)
+        self.pan_rate = fit_loop_freq(float(pan_rate), state.get("loop_n"))
+        self.pan_depth = np.float32(pan_depth)
+        # الطور من تيار مستقل عن ضوضاء التفكيك، فلا يعتمد على طول الإشارة أو نقطة البداية
+        self.phase = op_rng(state, "phase").uniform(0, 2*np.pi)
+        self.noise = noise_stream(state)
+        self.lp = OnePoleLowpass(1200.0)
+        self.arena = arena_of(state)
+        self.pos = int(state.get("start", 0))
+
+    def __call__(self, x, out=None):
+        # out is used only if it has the stereo result's shape; otherwise a stereo arena buffer is returned
+        if x.ndim == 2:
+            if out is None or out is x:
+                return x
+            out[...] = x
+            return out
+        n = x.shape[0]
+        a = self.arena
+        decor = self.noise.standard_normal(n, out=a.get((self, "decor"), (n,)))
+        decor *= self.spread
+        decor = self.lp(decor, out=decor)
+        decor *= np.float32(0.5)
+
+        pan = lfo_sine_kr(n, self.pan_rate, start=self.pos, out=a.get((self, "pan"), (n,)), phase=self.phase)
+        pan *= self.pan_depth
+        self.pos += n
+
+        st = out if out is not None and out.shape == (n, 2) else a.get((self, "stereo"), (n, 2))
+        gain = a.get((self, "gain"), (n,))
+        np.add(x, decor, out=st[:, 0])
+        np.add(np.float32(1.0), pan, out=gain)
+        st[:, 0] *= gain
+        np.subtract(x, decor, out=st[:, 1])
+        np.subtract(np.float32(1.0), pan, out=gain)
+        st[:, 1] *= gain
+        return st
+
+def process(x, *, state, **kwargs):
+    return Processor(state=state, **kwargs)(x)
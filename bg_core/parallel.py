@@ -0,0 +1,150 @@
+# bg_core/parallel.py
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+import os
+import numpy as np
+from bg_utils import SR, stereo_normalize
+from wav_io import data_memmap, preallocate_wav, to_pcm16
+from .engine import BLOCK, _run_pipeline, load_profile, profile_level, resolve_seed
+
+# Segment layout, in engine blocks (fixed, so the output never depends on the worker count)
+CHUNK_BLOCKS = 20    # blocks owned by each chunk (~30 s)
+WARMUP_BLOCKS = 1    # rendered and discarded so filter memory settles (~1.5 s)
+
+class _Serial(Executor):
+    """In-process executor for workers=1 (same chunk layout, no pool)."""
+
+    def submit(self, fn, *args, **kwargs):
+        fut = Future()
+        try:
+            fut.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            fut.set_exception(e)
+        return fut
+
+def chunk_plan(n: int, *, block: int = BLOCK, chunk_blocks: int = CHUNK_BLOCKS,
+               warmup_blocks: int = WARMUP_BLOCKS) -> list[tuple[int, int, int]]:
+    """Split n samples into (render_start, keep_start, end) triples.
+
+    Chunk i owns [keep_start, end) and starts rendering warmup_blocks earlier.
+    Everything is aligned to the engine block grid, so each op sees the same
+    call boundaries as in a monolithic render.
+    """
+    C = max(1, int(chunk_blocks)) * int(block)
+    W = max(0, int(warmup_blocks)) * int(block)
+    return [(max(0, s - W), s, min(n, s + C)) for s in range(0, n, C)]
+
+def _render_chunk(steps, n, render_start, keep_start, end, seed, block):
+    # Worker: fresh operator state from render_start; every RNG stream seeks there
+    state = {"SR": SR, "seed": seed, "n": n, "start": render_start}
+    y = np.empty((end - render_start, 2), dtype=np.float32)
+    pos = 0
+    for blk in _run_pipeline(steps, end - render_start, state, block):
+        y[pos:pos + blk.shape[0]] = blk
+        pos += blk.shape[0]
+    return y[keep_start - render_start:]
+
+def _peak_chunk(steps, n, render_start, keep_start, end, seed, block):
+    # Worker: only the chunk's peak travels back to the parent
+    y = _render_chunk(steps, n, render_start, keep_start, end, seed, block)
+    return float(np.max(np.abs(y))) if y.size else 0.0
+
+def _write_chunk(steps, n, render_start, keep_start, end, seed, block, path, scale, dither_seed):
+    # Worker: render, scale and dither straight into the chunk's own frames of the mapped file
+    y = _render_chunk(steps, n, render_start, keep_start, end, seed, block)
+    y *= np.float32(scale)
+    rng = np.random.default_rng((int(dither_seed), int(keep_start)))
+    mm = data_memmap(path)
+    to_pcm16(y, mm[keep_start:end], rng=rng, scratch=y)
+    mm.flush()
+    del mm
+    return end - keep_start
+
+def _chunks(steps, n, seed, workers, block, layout, task=_render_chunk, args=()):
+    """Run task on every chunk of the plan on a pool -> yield its results in timeline order.
+
+    task defaults to _render_chunk (each chunk's kept samples). At most
+    2 * workers chunks are in flight, so memory stays bounded.
+    """
+    plan = chunk_plan(n, block=block, **layout)
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    pool = _Serial() if workers == 1 else ProcessPoolExecutor(max_workers=min(workers, len(plan) or 1))
+    with pool:
+        pending = deque()
+        it = iter(plan)
+        for job in it:
+            pending.append(pool.submit(task, steps, n, *job, seed, block, *args))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            fut = pending.popleft()
+            job = next(it, None)
+            if job is not None:
+                pending.append(pool.submit(task, steps, n, *job, seed, block, *args))
+            yield fut.result()
+
+def stream_segments(profile_path: str, minutes: float, *, seed: int, workers: int | None = None,
+                    block: int = BLOCK, **layout):
+    """Segment-parallel raw render -> yield (un-normalized) stereo chunks in order.
+
+    Every op's RNG stream is seeked to the chunk start and filter memory is
+    warmed up over the discarded lead-in, so chunks join without a seam and
+    match the monolithic render.
+    """
+    cfg = load_profile(profile_path)
+    n = int(minutes * 60 * SR)
+    yield from _chunks(cfg.get("pipeline", []), n, int(seed), workers, block, layout)
+
+def stream_parallel(profile_path: str, minutes: float, *, seed: int | None = None, level: float | None = None,
+                    workers: int | None = None, block: int = BLOCK, **layout):
+    """Two-pass segment-parallel render -> yield normalized stereo blocks.
+
+    Same seed and layout give the same output for any worker count.
+    """
+    seed = resolve_seed(seed)
+    target = profile_level(load_profile(profile_path), level)
+    peak = 0.0
+    for blk in stream_segments(profile_path, minutes, seed=seed, workers=workers, block=block, **layout):
+        if blk.size:
+            peak = max(peak, float(np.max(np.abs(blk))))
+    scale = np.float32(target / peak) if peak > 0 else np.float32(1.0)
+    for blk in stream_segments(profile_path, minutes, seed=seed, workers=workers, block=block, **layout):
+        blk *= scale
+        yield blk
+
+def render_parallel(profile_path: str, minutes: float, *, seed: int | None = None, level: float | None = None,
+                    workers: int | None = None, block: int = BLOCK, **layout) -> np.ndarray:
+    """Segment-parallel counterpart of run_profile: one pass, normalized in memory."""
+    seed = resolve_seed(seed)
+    target = profile_level(load_profile(profile_path), level)
+    n = int(minutes * 60 * SR)
+    out = np.empty((n, 2), dtype=np.float32)
+    pos = 0
+    for blk in stream_segments(profile_path, minutes, seed=seed, workers=workers, block=block, **layout):
+        out[pos:pos + blk.shape[0]] = blk
+        pos += blk.shape[0]
+    return stereo_normalize(out, target)
+
+def render_mmap(profile_path: str, minutes: float, path: str, *, seed: int | None = None,
+                level: float | None = None, workers: int | None = None, block: int = BLOCK,
+                metadata: bytes = b"", dither_seed: int = 0, **layout) -> int:
+    """Segment-parallel render straight into a preallocated, memory-mapped WAV file -> frames.
+
+    The file (RF64 past 4 GB) is sized up front. A first parallel pass
+    collects only chunk peaks; in the second each worker maps the data
+    region and writes its own disjoint frame range as dithered int16, so the
+    track never exists in RAM as a whole and there is no serial write. Dither
+    is seeded per chunk, so output does not depend on the worker count.
+    """
+    seed = resolve_seed(seed)
+    target = profile_level(load_profile(profile_path), level)
+    steps = load_profile(profile_path).get("pipeline", [])
+    n = int(minutes * 60 * SR)
+    preallocate_wav(path, n, SR, 2, metadata=metadata)
+    if n == 0:
+        return 0
+    peak = max(_chunks(steps, n, seed, workers, block, layout, task=_peak_chunk))
+    scale = target / peak if peak > 0 else 1.0
+    return sum(_chunks(steps, n, seed, workers, block, layout, task=_write_chunk,
+                       args=(str(path), scale, dither_seed)))
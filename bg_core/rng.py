@@ -0,0 +1,26 @@
+# bg_core/rng.py
+from __future__ import annotations
+import zlib
+import numpy as np
+from bg_utils import NoiseStream
+
+def _tag(s: str) -> int:
+    return zlib.crc32(str(s).encode("utf-8"))
+
+def op_seed(state: dict, tag: str = "") -> np.random.SeedSequence:
+    """Independent SeedSequence for one pipeline step (and one use within it).
+
+    Keyed on the render seed, the step's index and name (set by
+    compile_pipeline) and tag, so ops never share or correlate their streams
+    and every render of the same seed sees the same streams.
+    """
+    key = (int(state.get("step", 0)), _tag(state.get("op", "")), _tag(tag))
+    return np.random.SeedSequence(state.get("seed"), spawn_key=key)
+
+def op_rng(state: dict, tag: str = "") -> np.random.Generator:
+    """Generator for one-off structural draws (phases, event schedules, grain tables)."""
+    return np.random.default_rng(op_seed(state, tag))
+
+def noise_stream(state: dict, tag: str = "noise", dtype=np.float32) -> NoiseStream:
+    """Per-sample noise stream of a step, positioned at the render's first sample (state["start"])."""
+    return NoiseStream(op_seed(state, tag), dtype, int(state.get("start", 0)))
@@ -0,0 +1,123 @@
+# bg_core/telemetry.py
+from __future__ import annotations
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+class Telemetry:
+    """Per-stage render telemetry: wall time, CPU time, peak allocation and realtime factor.
+
+    Stages are named ("parse", "3:filter_lp", "normalize", "wav_write", ...)
+    and aggregated over calls. With track_alloc the peak bytes allocated
+    above the stage's starting point are measured through tracemalloc (NumPy
+    buffers included); nested stages are accounted correctly. callback, if
+    given, receives one record dict per stage plus a "total" record when
+    finish() is called.
+    """
+
+    def __init__(self, sr: int = 44100, *, track_alloc: bool = True,
+                 callback: Optional[Callable[[dict], None]] = None):
+        self.sr = int(sr)
+        self.track_alloc = track_alloc
+        self.callback = callback
+        self.stages: dict[str, dict] = {}
+        self._stack: list[dict] = []
+        self._started_tracing = False
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        if track_alloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextmanager
+    def stage(self, name: str, frames: int = 0):
+        """Time the with-block as one call of stage name.
+
+        Yields a dict whose "frames" entry may be set inside the block when
+        the frame count is only known afterwards.
+        """
+        frame = {"peak": 0, "start": 0, "frames": frames}
+        if self.track_alloc:
+            cur, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            frame["start"] = cur
+            tracemalloc.reset_peak()
+        self._stack.append(frame)
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield frame
+        finally:
+            wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+            self._stack.pop()
+            alloc = 0
+            if self.track_alloc:
+                peak = max(tracemalloc.get_traced_memory()[1], frame["peak"])
+                alloc = max(0, peak - frame["start"])
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            self.add(name, wall, cpu, alloc, frame["frames"])
+
+    def add(self, name: str, wall: float, cpu: float, alloc: int = 0, frames: int = 0) -> None:
+        rec = self.stages.get(name)
+        if rec is None:
+            rec = self.stages[name] = {"stage": name, "calls": 0, "wall_sec": 0.0, "cpu_sec": 0.0,
+                                       "peak_alloc_bytes": 0, "frames": 0}
+        rec["calls"] += 1
+        rec["wall_sec"] += wall
+        rec["cpu_sec"] += cpu
+        rec["peak_alloc_bytes"] = max(rec["peak_alloc_bytes"], int(alloc))
+        rec["frames"] += int(frames)
+
+    def records(self) -> list[dict]:
+        out = []
+        for rec in self.stages.values():
+            rec = dict(rec)
+            rec["realtime_x"] = (rec["frames"] / self.sr) / rec["wall_sec"] if rec["frames"] and rec["wall_sec"] else None
+            out.append(rec)
+        return out
+
+    def finish(self) -> list[dict]:
+        """Stop tracing (if we started it), fire the callback and return all records."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        recs = self.records()
+        total = {"stage": "total", "calls": 1, "wall_sec": time.perf_counter() - self._t0,
+                 "cpu_sec": time.process_time() - self._c0, "peak_alloc_bytes": None,
+                 "frames": None, "realtime_x": None}
+        recs.append(total)
+        if self.callback is not None:
+            for rec in recs:
+                self.callback(rec)
+        return recs
+
+    @staticmethod
+    def format(records: list[dict], fmt: str = "table") -> str:
+        if fmt == "json":
+            return json.dumps(records, indent=2)
+        lines = [f"{'stage':<26} {'calls':>6} {'wall s':>9} {'cpu s':>9} {'alloc MB':>9} {'realtime':>9}"]
+        for r in records:
+            alloc = f"{r['peak_alloc_bytes'] / 2**20:9.1f}" if r.get("peak_alloc_bytes") else f"{'-':>9}"
+            rt = f"{r['realtime_x']:8.0f}x" if r.get("realtime_x") else f"{'-':>9}"
+            lines.append(f"{r['stage']:<26} {r['calls']:>6} {r['wall_sec']:>9.3f} {r['cpu_sec']:>9.3f} {alloc} {rt}")
+        return "\n".join(lines)
+
+
+class Timed:
+    """Wrap an operator (or pipeline node) so each call is recorded as a telemetry stage."""
+
+    def __init__(self, proc, name: str, telemetry: Telemetry):
+        self.proc = proc
+        self.name = name
+        self.telemetry = telemetry
+
+    def __call__(self, x, out=None):
+        with self.telemetry.stage(self.name, x.shape[0]):
+            return self.proc(x, out=out)
+
+    def envelope(self, n, out=None):
+        with self.telemetry.stage(self.name, n):
+            return self.proc.envelope(n, out=out)
@@ -2,60 +2,592 @@
 bg_utils.py — أدوات مساعدة لتوليد ومعالجة الإشارات الصوتية
 """
 
+import warnings
+
 import numpy as np
 
 # 🎯 معدل العينة الافتراضي (Hz)
 SR = 44100
 
+# حدود محرك فلاتر IIR المتجه
+_IIR_CHUNK = 1 << 18      # عدد العينات المعالجة في كل دفعة float64
+_IIR_MAX_BLOCK = 4096     # أقصى طول لكتلة الحل المغلق
+_IIR_MAX_EXP = 500.0      # أقصى قيمة لـ B*ln(1/a) حتى لا تفيض a^-B
+
 
 # ─────────────────────────────
 # 📌 توليد الضوضاء والموجات البطيئة
 # ─────────────────────────────
 
+# معاملات خوارزمية Paul Kellet: (القطب، الكسب) لكل فلتر من الفلاتر المتوازية
+_PINK_POLES = (
+    (0.99886, 0.0555179),
+    (0.99332, 0.0750759),
+    (0.96900, 0.1538520),
+    (0.86650, 0.3104856),
+    (0.55000, 0.5329522),
+    (-0.7616, -0.0168980),
+)
+_PINK_DIRECT = 0.5362
+_PINK_DELAY = 0.115926
+
+# قيمة RMS لمخرج Kellet عند دخل أبيض بتباين 1 (لمعايرة الطرق الأخرى عليها)
+_PINK_RMS = 3.04
+# عدد صفوف Voss-McCartney
+_VOSS_ROWS = 16
+# طول إطار FFT لطريقة "fft" (دقة ~2.7 Hz عند 44.1 kHz)
+_FFT_PINK_N = 1 << 14
+
+
+class PinkFilter:
+    """
+    فلتر Paul Kellet ذو حالة: يحوّل ضوضاء بيضاء إلى وردية على دفعات متتالية.
+    الفلاتر السبعة تُحسب كفلاتر IIR متوازية ومتجهة بدل حلقة لكل عينة.
+    """
+
+    def __init__(self):
+        self.taps = [0.0] * len(_PINK_POLES)
+        self.prev = 0.0
+
+    def __call__(self, white: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        white = np.asarray(white)
+        n = white.shape[0]
+        pink = np.empty(white.shape, dtype=np.float32) if out is None else out
+        for s in range(0, n, _IIR_CHUNK):
+            w = white[s:s + _IIR_CHUNK].astype(np.float64)
+            acc = w * _PINK_DIRECT
+            # b[6] يحمل العينة السابقة (تأخير عينة واحدة)
+            acc[0] += self.prev * _PINK_DELAY
+            acc[1:] += w[:-1] * _PINK_DELAY
+            for j, (a, g) in enumerate(_PINK_POLES):
+                y, self.taps[j] = _iir1_blocks(w, a, g, self.taps[j])
+                acc += y
+            self.prev = w[-1]
+            pink[s:s + _IIR_CHUNK] = acc
+        return pink
+
+
 def pinkish(white: np.ndarray) -> np.ndarray:
     """
     تحويل ضوضاء بيضاء إلى ضوضاء وردية باستخدام خوارزمية فلتر بسيطة.
     white: مصفوفة ضوضاء بيضاء (float32)
     """
-    b = np.zeros(7, dtype=np.float32)
-    pink = np.zeros_like(white)
-    for i, w in enumerate(white):
-        b[0] = 0.99886 * b[0] + w * 0.0555179
-        b[1] = 0.99332 * b[1] + w * 0.0750759
-        b[2] = 0.96900 * b[2] + w * 0.1538520
-        b[3] = 0.86650 * b[3] + w * 0.3104856
-        b[4] = 0.55000 * b[4] + w * 0.5329522
-        b[5] = -0.7616 * b[5] - w * 0.0168980
-        pink[i] = b[0] + b[1] + b[2] + b[3] + b[4] + b[5] + b[6] + w * 0.5362
-        b[6] = w * 0.115926
-    return pink.astype(np.float32)
+    return PinkFilter()(white)
+
+
+# طول صفحة NoiseStream: كل صفحة لها بذرة فرعية مستقلة
+_NOISE_PAGE = 1 << 16
+
+
+class NoiseStream:
+    """
+    ضوضاء غاوسية حتمية قابلة للقفز إلى أي عينة.
+    العينة i تأتي من الصفحة i // _NOISE_PAGE ولكل صفحة SeedSequence فرعي خاص
+    (spawn_key + رقم الصفحة)، لذا لا تعتمد القيم على حجم الدفعات أو نقطة البداية.
+    (advance في PCG64 لا يكفي هنا: standard_normal يستهلك عددًا متغيرًا من الأرقام)
+    """
+
+    def __init__(self, seq: np.random.SeedSequence, dtype=np.float32, start: int = 0):
+        self.seq = seq
+        self.dtype = np.dtype(dtype)
+        self.pos = int(start)
+        self._page = (-1, None)
+
+    def seek(self, pos: int) -> None:
+        self.pos = int(pos)
+
+    def _get_page(self, p: int) -> np.ndarray:
+        if self._page[0] != p:
+            seq = np.random.SeedSequence(self.seq.entropy, spawn_key=tuple(self.seq.spawn_key) + (p,),
+                                         pool_size=self.seq.pool_size)
+            self._page = (p, np.random.default_rng(seq).standard_normal(_NOISE_PAGE, dtype=self.dtype))
+        return self._page[1]
+
+    def read(self, start: int, count: int, out: np.ndarray | None = None) -> np.ndarray:
+        """العينات [start, start+count) دون تغيير الموضع الحالي."""
+        if out is None:
+            out = np.empty(count, dtype=self.dtype)
+        i = 0
+        while i < count:
+            p, k = divmod(start + i, _NOISE_PAGE)
+            m = min(count - i, _NOISE_PAGE - k)
+            out[i:i + m] = self._get_page(p)[k:k + m]
+            i += m
+        return out
+
+    def standard_normal(self, count: int, dtype=None, out: np.ndarray | None = None) -> np.ndarray:
+        """قراءة متتابعة بنفس توقيع Generator.standard_normal."""
+        out = self.read(self.pos, int(count), out)
+        self.pos += int(count)
+        return out
+
+
+def _seed_seq(src) -> np.random.SeedSequence:
+    # Generator قديم -> SeedSequence مشتق منه (للاستدعاءات القديمة مثل pink_noise)
+    if isinstance(src, np.random.SeedSequence):
+        return src
+    return np.random.SeedSequence(int(src.integers(1 << 63)))
+
+
+class _KelletPink:
+    def __init__(self, seq: np.random.SeedSequence, n=None, start: int = 0):
+        self.white = NoiseStream(seq, np.float32, start)
+        self.filter = PinkFilter()
+        self._white = np.empty(0, dtype=np.float32)
+
+    def __call__(self, count: int, out: np.ndarray | None = None) -> np.ndarray:
+        if self._white.shape[0] < count:
+            self._white = np.empty(count, dtype=np.float32)
+        white = self.white.standard_normal(count, out=self._white[:count])
+        return self.filter(white, out=out)
+
+
+class _VossPink:
+    # Voss-McCartney: الصف r يتجدد كل 2^r عينة، والمجموع يعطي ميلًا 1/f.
+    # قيمة الصف r في الخانة s هي العينة s من تياره الخاص، فيمكن البدء من أي موضع.
+    def __init__(self, seq: np.random.SeedSequence, n=None, start: int = 0):
+        kids = seq.spawn(_VOSS_ROWS + 1)
+        offsets = np.random.default_rng(kids[0]).integers(0, 1 << np.arange(1, _VOSS_ROWS))
+        self.white = NoiseStream(kids[1], np.float64, start)
+        self.rows = [(1 << r, int(o), NoiseStream(k, np.float64))
+                     for r, (o, k) in enumerate(zip(offsets, kids[2:]), start=1)]
+        self.pos = int(start)
+
+    def __call__(self, count: int, out: np.ndarray | None = None) -> np.ndarray:
+        acc = self.white.standard_normal(count)
+        idx = np.arange(self.pos, self.pos + count)
+        for step, offset, row in self.rows:
+            slots = (idx + offset) // step
+            first, last = int(slots[0]), int(slots[-1])
+            acc += row.read(first, last - first + 1)[slots - first]
+        self.pos += count
+        # RMS المجموع ≈ sqrt(الصفوف + 0.5) بسبب الصف الأبيض وتداخل الإزاحات
+        acc *= _PINK_RMS / np.sqrt(_VOSS_ROWS + 0.5)
+        if out is None:
+            return acc.astype(np.float32)
+        out[:] = acc
+        return out
+
+
+class _FftPink:
+    # تشكيل طيفي 1/sqrt(f) على دفعات عبر SpectralNoise (overlap-add بإطارات _FFT_PINK_N)
+    # فوق تيار ضوضاء بيضاء قابل للقفز: الذاكرة بطول إطار واحد، والبدء من أي موضع
+    # لا يحسب ما قبله، والنتيجة لا تعتمد على حجم الدفعات. n غير مستخدم.
+    def __init__(self, seq: np.random.SeedSequence, n=None, start: int = 0):
+        self.noise = SpectralNoise(NoiseStream(seq, np.float32), spectral_shape(_FFT_PINK_N, "pink"), start)
+
+    def __call__(self, count: int, out: np.ndarray | None = None) -> np.ndarray:
+        return self.noise(count, out=out)
+
+
+_PINK_METHODS = {
+    "kellet": _KelletPink,
+    "voss": _VossPink,
+    "fft": _FftPink,
+}
+
+
+def pink_stream(rng, method: str = "kellet", n: int | None = None, start: int = 0):
+    """
+    مولد ضوضاء وردية على دفعات: يعيد دالة (count, out=None) -> مصفوفة float32 بطول count.
+    rng: SeedSequence (أو Generator يُشتق منه SeedSequence)
+    method: "kellet" (فلاتر متوازية) أو "voss" (Voss-McCartney) أو "fft" (تشكيل طيفي)
+    n: الطول الكلي المتوقع (غير مستخدم؛ يبقى للتوافق)
+    start: رقم العينة الأولى؛ الضوضاء البيضاء تبدأ من نفس الموضع في التيار
+    (ذاكرة فلاتر kellet تبدأ من الصفر وتحتاج فترة إحماء قصيرة).
+    النتيجة حتمية لنفس البذرة ونفس الطريقة ولا تتأثر بحجم الدفعات.
+    """
+    if method not in _PINK_METHODS:
+        raise ValueError(f"Unknown pink-noise method '{method}'. Known: {', '.join(sorted(_PINK_METHODS))}")
+    return _PINK_METHODS[method](_seed_seq(rng), n, start)
+
+
+def pink_noise(n: int, rng: np.random.Generator, method: str = "kellet") -> np.ndarray:
+    """
+    توليد n عينة ضوضاء وردية (float32) من مولد أرقام عشوائية.
+    """
+    n = int(n)
+    if n <= 0:
+        return np.zeros(0, dtype=np.float32)
+    return pink_stream(rng, method, n)(n)
+
+
+# ميل الطيف (dB لكل أوكتاف) لكل لون ضوضاء
+NOISE_COLORS = {"white": 0.0, "pink": -3.0, "brown": -6.0, "red": -6.0, "blue": 3.0, "violet": 6.0}
+
+
+def parse_eq(eq) -> list[tuple[float, float]]:
+    """
+    منحنى EQ بنقاط انكسار: "100/-6;300/0;3000/-12" (تردد Hz / كسب dB، مفصولة بـ ;)
+    أو قائمة أزواج (freq, db). تُعاد النقاط مرتبة حسب التردد.
+    """
+    if not eq:
+        return []
+    if isinstance(eq, str):
+        try:
+            points = [tuple(float(v) for v in p.split("/")) for p in eq.split(";") if p.strip()]
+        except ValueError:
+            raise ValueError(f"Bad EQ curve '{eq}': expected 'freq/dB;freq/dB;...'") from None
+    else:
+        points = [tuple(float(v) for v in p) for p in eq]
+    if any(len(p) != 2 or p[0] <= 0 for p in points):
+        raise ValueError(f"Bad EQ curve '{eq}': each point is freq/dB with freq > 0")
+    return sorted(points)
+
+
+def spectral_shape(nfft: int, color: str = "white", slope: float | None = None, eq=None,
+                   f_min: float = 20.0) -> np.ndarray:
+    """
+    مقدار الطيف المطلوب لكل خانة rfft بطول nfft (float32، مركبة DC = 0).
+    color/slope: ميل بالـ dB لكل أوكتاف حول 1 kHz (slope يتقدم على color)
+    eq: نقاط انكسار (انظر parse_eq) تُستوفى خطياً بالـ dB على محور log2(f)، وتمتد أفقياً خارجها
+    تحت f_min يثبت الميل حتى لا تنفجر الترددات المنخفضة (brown).
+    يُطبَّع المقدار بحيث يكون متوسط |H|^2 = 1 فتبقى طاقة الضوضاء البيضاء كما هي.
+    """
+    if slope is None:
+        if color not in NOISE_COLORS:
+            raise ValueError(f"Unknown noise color '{color}'. Known: {', '.join(sorted(NOISE_COLORS))}")
+        slope = NOISE_COLORS[color]
+    f = np.fft.rfftfreq(int(nfft), 1.0 / SR)
+    octaves = np.log2(np.maximum(f, f_min) / 1000.0)
+    db = float(slope) * octaves
+    points = parse_eq(eq)
+    if points:
+        fx, gy = zip(*points)
+        db += np.interp(octaves, np.log2(np.maximum(fx, f_min) / 1000.0), gy)
+    mag = 10.0 ** (db / 20.0)
+    mag[0] = 0.0
+    mag /= np.sqrt(np.mean(mag[1:] ** 2))
+    return mag.astype(np.float32)
+
+
+class SpectralNoise:
+    """
+    ضوضاء ملونة بأي طيف في مرحلة FFT واحدة (overlap-add بنصف إطار).
+    كل إطار بطول nfft يبدأ عند j*nfft/2 (شبكة مثبتة على العينة 0): يؤخذ من تيار
+    ضوضاء بيضاء قابل للقفز، يُنوفذ بـ sqrt-Hann، ثم rfft × المقدار، ثم irfft ونافذة
+    ثانية؛ مجموع النافذتين Hann فيتراكب ثابتاً. لذا لا تعتمد العينات على تقسيم
+    الدفعات ويمكن البدء من أي موضع. مستوى RMS كالضوضاء الوردية (_PINK_RMS).
+    """
+
+    def __init__(self, white: NoiseStream, mag: np.ndarray, start: int = 0):
+        self.white = white
+        self.nfft = 2 * (mag.shape[0] - 1)
+        self.hop = self.nfft // 2
+        self.mag = mag
+        self.window = np.sin(np.pi * np.arange(self.nfft) / self.nfft).astype(np.float32)
+        self.pos = int(start)
+
+    def __call__(self, count: int, out: np.ndarray | None = None) -> np.ndarray:
+        N, H = self.nfft, self.hop
+        start = self.pos
+        self.pos += count
+        if out is None:
+            out = np.empty(count, dtype=np.float32)
+        if count <= 0:
+            return out
+        # الإطارات التي تغطي [start, start+count)؛ الإطارات قبل العينة 0 غير موجودة (بداية تدريجية)
+        j0 = max(0, (start - N) // H + 1)
+        j1 = (start + count - 1) // H
+        F = j1 - j0 + 1
+        x = self.white.read(j0 * H, (F + 1) * H)
+        frames = np.lib.stride_tricks.sliding_window_view(x, N)[::H] * self.window
+        spec = np.fft.rfft(frames, axis=1)
+        spec *= self.mag
+        y = np.fft.irfft(spec, N, axis=1).astype(np.float32, copy=False)
+        y *= self.window
+        ola = np.zeros((F + 1, H), dtype=np.float32)
+        ola[:F] += y[:, :H]
+        ola[1:] += y[:, H:]
+        off = start - j0 * H
+        np.multiply(ola.reshape(-1)[off:off + count], np.float32(_PINK_RMS), out=out)
+        return out
 
 
-def lfo_sine(n: int, f: float) -> np.ndarray:
+def lfo_sine(n: int, f: float, start: int = 0, out: np.ndarray | None = None) -> np.ndarray:
     """
     توليد موجة LFO جيبية.
     n: عدد العينات
     f: تردد LFO (Hz)
+    start: رقم العينة الأولى (لمتابعة الطور عبر الدفعات)
+    out: مصفوفة float32 اختيارية للنتيجة
+    """
+    ph = np.arange(n, dtype=np.float64)
+    ph += start
+    ph *= 2 * np.pi * float(f) / SR
+    np.sin(ph, out=ph)
+    if out is None:
+        return ph.astype(np.float32)
+    out[:] = ph
+    return out
+
+
+# خطوة معدل التحكم: إشارات التعديل البطيئة تُحسب مرة كل CONTROL_STEP عينة
+CONTROL_STEP = 64
+
+
+def control_rate(points, n: int, start: int = 0, step: int = CONTROL_STEP,
+                 out: np.ndarray | None = None) -> np.ndarray:
+    """
+    إشارة تعديل بمعدل التحكم (float32).
+    points(k): قيم الإشارة عند العينات k*step لمصفوفة أعداد صحيحة k
+    تُستكمل العينات بين النقاط باستيفاء خطي. الشبكة مثبتة على العينة 0 لا على
+    بداية الدفعة، لذا لا تعتمد النتيجة على تقسيم الدفعات أو نقطة البداية.
+    """
+    n = int(n)
+    if out is None:
+        out = np.empty(n, dtype=np.float32)
+    if n <= 0:
+        return out
+    step = int(step)
+    k0 = start // step
+    k1 = -(-(start + n) // step)
+    v = np.asarray(points(np.arange(k0, k1 + 1, dtype=np.int64)), dtype=np.float32)
+    seg = k1 - k0
+    off = start - k0 * step
+    aligned = off == 0 and n == seg * step
+    grid = out.reshape(seg, step) if aligned else np.empty((seg, step), dtype=np.float32)
+    ramp = np.arange(step, dtype=np.float32) / np.float32(step)
+    np.multiply(np.diff(v)[:, None], ramp, out=grid)
+    grid += v[:-1, None]
+    if not aligned:
+        out[:] = grid.reshape(-1)[off:off + n]
+    return out
+
+
+def lfo_sine_kr(n: int, f: float, start: int = 0, out: np.ndarray | None = None,
+                phase: float = 0.0, step: int = CONTROL_STEP) -> np.ndarray:
+    """
+    موجة LFO جيبية بمعدل التحكم: sin(2π·f·t + phase) تُحسب كل step عينة فقط
+    ثم تُستكمل خطياً (الخطأ أقل من 1e-5 لترددات LFO تحت 1 Hz).
+    الطور يُحسب بعدد الدورات modulo 1 بدقة float64، فلا ينجرف في التسجيلات الطويلة.
     """
-    t = np.arange(n, dtype=np.float32) / np.float32(SR)
-    return np.sin(2 * np.pi * np.float32(f) * t)
+    cycles = float(f) * step / SR
+
+    def points(k):
+        ph = np.mod(k * cycles, 1.0)
+        ph *= 2 * np.pi
+        ph += phase
+        return np.sin(ph, out=ph)
+
+    return control_rate(points, n, start, step, out)
+
+
+def fit_loop_freq(f: float, loop_n: int | None) -> float:
+    """
+    تقريب تردد LFO إلى عدد صحيح من الدورات داخل حلقة طولها loop_n عينة
+    (دورة واحدة على الأقل) حتى تتكرر الحلقة دون قفزة في التعديل.
+    إذا كانت دورة LFO أطول من الحلقة يُسرَّع إلى دورة واحدة مع تحذير (RuntimeWarning).
+    loop_n = None يعيد التردد كما هو.
+    """
+    if not loop_n or f == 0:
+        return f
+    if abs(f) * loop_n < SR:
+        warnings.warn(f"LFO at {abs(f):g} Hz has a {1 / abs(f):.1f} s period, longer than the "
+                      f"{loop_n / SR:.1f} s loop: sped up to {SR / loop_n:.4g} Hz. "
+                      f"Use a loop of at least {1 / abs(f):.1f} s to keep its rate.",
+                      RuntimeWarning, stacklevel=2)
+    cycles = max(1, round(abs(f) * loop_n / SR))
+    return float(np.sign(f)) * cycles * SR / loop_n
 
 
 # ─────────────────────────────
 # 📌 فلاتر بسيطة
 # ─────────────────────────────
 
+def _iir1_blocks(x: np.ndarray, a: float, b: float, zi) -> tuple[np.ndarray, np.ndarray]:
+    """
+    حلّ المعادلة y[i] = a*y[i-1] + b*x[i] على محور العينات دون حلقة لكل عينة.
+    تُقسَّم الإشارة إلى كتل طول كل منها B، وتُحسب استجابة كل كتلة بالصيغة المغلقة
+    y[i] = a^i * cumsum(b*x[k]*a^-k)، ثم تُمرَّر الحالة بين الكتل بنفس المعادلة (بمعامل a^B).
+    x: مصفوفة float64 (n, ...) — zi: الحالة السابقة y[-1]
+    a, b: أعداد، أو مصفوفات تتوافق مع المحاور الأخيرة لـ x (قطب لكل عمود، انظر OnePoleBank)
+    """
+    n = x.shape[0]
+    rest = x.shape[1:]
+    zi = np.broadcast_to(np.asarray(zi, dtype=np.float64), rest)
+    if n == 0:
+        return x.copy(), np.array(zi, dtype=np.float64)
+
+    # اختيار طول الكتلة بحيث تبقى a^-B ضمن مدى float64 (لأسرع قطب تلاشيًا)
+    a_arr = np.asarray(a, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        la = float(np.max(-np.log(np.abs(a_arr))))
+    B = int(min(_IIR_MAX_BLOCK, n, _IIR_MAX_EXP / la)) if la > 0 else min(_IIR_MAX_BLOCK, n)
+    if B < 2:
+        # القطب قريب من الصفر: الحالة تتلاشى خلال عينة واحدة تقريبًا
+        y = np.empty_like(x)
+        prev = np.array(zi, dtype=np.float64)
+        for i in range(n):
+            prev = a * prev + b * x[i]
+            y[i] = prev
+        return y, prev
+
+    m = -(-n // B)
+    xb = np.zeros((m * B,) + rest, dtype=np.float64)
+    xb[:n] = x
+    xb = xb.reshape((m, B) + rest)
+
+    k = np.arange(B, dtype=np.float64)
+    shape = (1, B) + (1,) * len(rest)
+    kk = k.reshape(shape)
+    ar = a_arr.reshape((1, 1) + (1,) * (len(rest) - a_arr.ndim) + a_arr.shape)
+    p = np.power(ar, kk)                          # a^i
+    ip = np.power(ar, -kk)                        # a^-k
+    z = np.cumsum(xb * ip, axis=1)
+    z *= p
+    z *= b
+
+    # الحالة في بداية كل كتلة: s[j+1] = a^B * s[j] + z[j, B-1]
+    ends = z[:, -1]
+    if m == 1:
+        starts = zi[None]
+    else:
+        s, _ = _iir1_blocks(ends[:-1], float(a) ** B if a_arr.ndim == 0 else a_arr ** B, 1.0, zi)
+        starts = np.concatenate([zi[None], s], axis=0)
+    z += np.power(ar, kk + 1) * starts[:, None]
+
+    y = z.reshape((m * B,) + rest)[:n]
+    return y, np.array(y[-1], dtype=np.float64)
+
+
+def iir1(x: np.ndarray, a: float, b: float, zi=0.0, out: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    فلتر IIR من رتبة أولى: y[i] = a*y[i-1] + b*x[i] على المحور الأول.
+    x: إشارة أحادية (n,) أو متعددة القنوات (n, ch)
+    zi: الحالة الابتدائية y[-1] (تُعاد الحالة النهائية لمتابعة المعالجة على دفعات)
+    out: مصفوفة float32 اختيارية للنتيجة (يمكن أن تكون x نفسها)
+    يعيد (y بصيغة float32, الحالة النهائية)
+    """
+    x = np.asarray(x)
+    n = x.shape[0]
+    y = np.empty(x.shape, dtype=np.float32) if out is None else out
+    state = np.broadcast_to(np.asarray(zi, dtype=np.float64), x.shape[1:]).copy()
+    for s in range(0, n, _IIR_CHUNK):
+        seg, state = _iir1_blocks(x[s:s + _IIR_CHUNK].astype(np.float64), float(a), float(b), state)
+        y[s:s + _IIR_CHUNK] = seg
+    return y, state
+
+
+class OnePoleLowpass:
+    """
+    فلتر Low-Pass من رتبة أولى ذو حالة للمعالجة على دفعات متتالية.
+    أول عينة في أول دفعة تُستخدم حالة ابتدائية (y[0] = x[0]).
+    """
+
+    def __init__(self, cutoff: float):
+        self.a = float(np.exp(-2 * np.pi * cutoff / SR))
+        self.zi = None
+
+    def __call__(self, x: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        if len(x) == 0:
+            return np.zeros_like(x, dtype=np.float32)
+        if self.zi is None:
+            self.zi = np.array(x[0], dtype=np.float64)
+        y, self.zi = iir1(x, self.a, 1 - self.a, zi=self.zi, out=out)
+        return y
+
+
+def one_pole_parallel(stages, tol: float = 1e-12, max_residue: float = 1e6):
+    """
+    دمج سلسلة مراحل خطية في صيغة متوازية (كسور جزئية).
+    كل مرحلة (direct, [(a, r), ...]) تمثل H(z) = direct + Σ r·L_a(z) حيث
+    L_a(z) = (1-a)/(1 - a·z^-1) هو OnePoleLowpass بقطب a.
+    حاصل ضرب المراحل يُفك بالعلاقة L_p·L_q = p(1-q)/(p-q)·L_p + q(1-p)/(q-p)·L_q
+    فيعاد (direct, poles, residues) — أو None إذا تكرر قطب بين مرحلتين (L_p² ليس
+    له هذه الصيغة) أو كبرت البواقي فوق max_residue (أقطاب متقاربة جدًا).
+    """
+    direct, terms = 1.0, {}
+    for d, sec in stages:
+        merged = {}
+        for a, r in sec:
+            merged[float(a)] = merged.get(float(a), 0.0) + float(r)
+        sec = {a: r for a, r in merged.items() if r != 0.0}
+        new = {p: r * d for p, r in terms.items()}
+        for q, s in sec.items():
+            new[q] = new.get(q, 0.0) + direct * s
+        for p, r in terms.items():
+            for q, s in sec.items():
+                if abs(p - q) <= tol:
+                    return None
+                new[p] += r * s * p * (1 - q) / (p - q)
+                new[q] += r * s * q * (1 - p) / (q - p)
+        direct *= float(d)
+        terms = new
+    if any(abs(r) > max_residue for r in terms.values()):
+        return None
+    poles = np.array(list(terms), dtype=np.float64)
+    residues = np.array(list(terms.values()), dtype=np.float64)
+    return direct, poles, residues
+
+
+class OnePoleBank:
+    """
+    عدة فلاتر Low-Pass من رتبة أولى على نفس الدخل في تمريرة واحدة لكل دفعة:
+    y = direct·x + Σ residues[p]·LP_p(x)، بحساب متجه لكل الأقسام معًا (محور أخير
+    لـ _iir1_blocks) وجمع بدقة float64. مع one_pole_parallel تنفذ سلسلة فلاتر كاملة.
+    أول عينة في أول دفعة حالة ابتدائية لكل الأقسام (كما في OnePoleLowpass).
+    """
+
+    def __init__(self, direct: float, poles: np.ndarray, residues: np.ndarray):
+        self.direct = float(direct)
+        self.a = np.asarray(poles, dtype=np.float64)
+        self.r = np.asarray(residues, dtype=np.float64)
+        self.zi = None
+
+    def __call__(self, x: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        y = np.empty(x.shape, dtype=np.float32) if out is None else out
+        n = x.shape[0]
+        P = self.a.shape[0]
+        # عمود لكل (قناة، قسم): مصفوفة ثنائية الأبعاد متصلة أسرع من محور أقسام إضافي
+        ch = int(np.prod(x.shape[1:], dtype=np.int64))
+        a = np.tile(self.a, ch)
+        for s in range(0, n, _IIR_CHUNK):
+            seg = x[s:s + _IIR_CHUNK].astype(np.float64).reshape(-1, ch)
+            if self.zi is None:
+                self.zi = np.repeat(seg[0], P)
+            bank, self.zi = _iir1_blocks(np.repeat(seg, P, axis=1), a, 1 - a, self.zi)
+            acc = self.direct * seg
+            for k in range(P):
+                acc += self.r[k] * bank[:, k::P]
+            y[s:s + _IIR_CHUNK] = acc.reshape((-1,) + x.shape[1:])
+        return y
+
+
+class OnePoleHighpass:
+    """
+    فلتر High-Pass من رتبة أولى ذو حالة للمعالجة على دفعات متتالية.
+    """
+
+    def __init__(self, cutoff: float):
+        self.a = float(np.exp(-2 * np.pi * cutoff / SR))
+        self.zi = None
+        self.prev = None
+
+    def __call__(self, x: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        if len(x) == 0:
+            return np.zeros_like(x, dtype=np.float32)
+        x64 = x.astype(np.float64)
+        y = np.empty(x.shape, dtype=np.float32) if out is None else out
+        if self.zi is None:
+            # y[0] = x[0] ثم y[i] = a*y[i-1] + a*(x[i] - x[i-1])
+            y[0] = x64[0]
+            _, self.zi = iir1(np.diff(x64, axis=0), self.a, self.a, zi=x64[0], out=y[1:])
+        else:
+            d = x64.copy()
+            d[0] -= self.prev
+            d[1:] -= x64[:-1]
+            _, self.zi = iir1(d, self.a, self.a, zi=self.zi, out=y)
+        self.prev = x64[-1]
+        return y
+
+
 def one_pole_lowpass(x: np.ndarray, cutoff: float) -> np.ndarray:
     """
     فلتر Low-Pass من رتبة أولى.
     cutoff: التردد القاطع (Hz)
     """
-    a = np.exp(-2 * np.pi * cutoff / SR)
-    y = np.zeros_like(x)
-    y[0] = x[0]
-    for i in range(1, len(x)):
-        y[i] = (1 - a) * x[i] + a * y[i - 1]
-    return y.astype(np.float32)
+    return OnePoleLowpass(cutoff)(x)
 
 
 def one_pole_highpass(x: np.ndarray, cutoff: float) -> np.ndarray:
@@ -63,12 +595,7 @@ def one_pole_highpass(x: np.ndarray, cutoff: float) -> np.ndarray:
     فلتر High-Pass من رتبة أولى.
     cutoff: التردد القاطع (Hz)
     """
-    a = np.exp(-2 * np.pi * cutoff / SR)
-    y = np.zeros_like(x)
-    y[0] = x[0]
-    for i in range(1, len(x)):
-        y[i] = a * (y[i - 1] + x[i] - x[i - 1])
-    return y.astype(np.float32)
+    return OnePoleHighpass(cutoff)(x)
 
 
 # ─────────────────────────────
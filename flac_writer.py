@@ -0,0 +1,528 @@
+"""
+flac_writer.py — streaming FLAC encoder (pure NumPy, no external binary)
+
+Frames of BLOCKSIZE samples are analysed a batch at a time with array
+operations: each stereo frame tries independent, left/side, side/right and
+mid/side coding, and each channel tries constant, verbatim, fixed (orders
+0-4) and LPC prediction (Levinson-Durbin on a windowed autocorrelation,
+quantized coefficients). Residuals are partitioned-Rice coded with one
+parameter per partition. Batches can be encoded on a process pool while
+the writer keeps the frames in order, so a track is never held in memory.
+
+Example:
+  python app.py bg --name rain --minutes 90 --format flac
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+import stat
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from wav_io import to_pcm16
+
+# Samples per channel in each frame (all frames but the last)
+BLOCKSIZE = 4096
+# Frames analysed together (and handed to one pool task)
+BATCH_FRAMES = 16
+# LPC orders tried per channel (fixed predictors cover orders 0-4)
+LPC_ORDERS = (2, 4, 8, 12)
+# Quantized LPC coefficient precision in bits
+QLP_PRECISION = 12
+MAX_PARTITION_ORDER = 6
+MAX_RICE_PARAM = 14
+BPS = 16
+
+_SR_CODES = {88200: 1, 176400: 2, 192000: 3, 8000: 4, 16000: 5, 22050: 6, 24000: 7,
+             32000: 8, 44100: 9, 48000: 10, 96000: 11}
+
+# Channel assignments (frame header)
+_INDEPENDENT, _LEFT_SIDE, _SIDE_RIGHT, _MID_SIDE = 1, 8, 9, 10
+
+# Metadata block types
+_STREAMINFO, _PADDING, _VORBIS_COMMENT, _PICTURE = 0, 1, 4, 6
+
+
+# ---------------- CRCs ----------------
+def _crc8_table() -> list:
+    table = []
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = ((c << 1) ^ 0x07) & 0xFF if c & 0x80 else (c << 1) & 0xFF
+        table.append(c)
+    return table
+
+
+_CRC8 = _crc8_table()
+
+
+def _crc8(data: bytes) -> int:
+    c = 0
+    for b in data:
+        c = _CRC8[c ^ b]
+    return c
+
+
+def _crc16_terms() -> np.ndarray:
+    # CRC-16 (poly 0x8005, init 0) is linear in the message bits: a 1 bit
+    # followed by d more bits contributes x^(d+16) mod P, which has period
+    # 32767, so a frame's CRC is the XOR of table entries at its set bits.
+    terms = []
+    r = 0x8005
+    while True:
+        terms.append(r)
+        r <<= 1
+        if r & 0x10000:
+            r ^= 0x18005
+        if r == 0x8005:
+            return np.array(terms, dtype=np.uint16)
+
+
+_CRC16 = _crc16_terms()
+
+
+# ---------------- bit packing ----------------
+def _expand_bits(vals: np.ndarray, nbits: np.ndarray) -> np.ndarray:
+    """Fields (value, width) written MSB first -> one uint8 per bit.
+
+    Widths may exceed 64 (long unary runs): the extra leading bits are 0.
+    """
+    nbits = nbits.astype(np.int64)
+    last = np.repeat(np.cumsum(nbits) - 1, nbits)
+    shift = last - np.arange(last.size)
+    long = shift > 63
+    np.minimum(shift, 63, out=shift)
+    bits = (np.repeat(vals.astype(np.uint64), nbits) >> shift.astype(np.uint64)).astype(np.uint8) & 1
+    bits[long] = 0
+    return bits
+
+
+def _utf8_number(v: int) -> bytes:
+    # Frame numbers use the (extended) UTF-8 coding scheme
+    if v < 0x80:
+        return bytes([v])
+    n = 2
+    while v >= 1 << (5 * n + 1):
+        n += 1
+    out = [0x80 | ((v >> (6 * i)) & 0x3F) for i in range(n - 1)][::-1]
+    return bytes([((0xFF00 >> n) & 0xFF) | (v >> (6 * (n - 1)))] + out)
+
+
+def _frame_header(frame_no: int, n: int, sr: int, assignment: int) -> bytes:
+    if n == 4096 or n in (256, 512, 1024, 2048, 8192, 16384, 32768):
+        bs_code, extra = 8 + int(np.log2(n // 256)), b""
+    elif n <= 256:
+        bs_code, extra = 6, bytes([n - 1])
+    else:
+        bs_code, extra = 7, struct.pack(">H", n - 1)
+    head = bytes([0xFF, 0xF8, (bs_code << 4) | _SR_CODES.get(sr, 0), (assignment << 4) | (0b100 << 1)])
+    head += _utf8_number(frame_no) + extra
+    return head + bytes([_crc8(head)])
+
+
+# ---------------- analysis ----------------
+def _rice_plan(u: np.ndarray, order: int):
+    """Best partition order and Rice parameters for zigzagged residuals.
+
+    u is (F, N) with the order warm-up columns zeroed. Costs use the usual
+    estimate n * (k + 1) + (sum >> k). Returns (bits, partition order,
+    parameters padded to 2**MAX_PARTITION_ORDER).
+    """
+    F, N = u.shape
+    pmax = 0
+    while pmax < MAX_PARTITION_ORDER and N % (2 << pmax) == 0 and (N >> (pmax + 1)) > order:
+        pmax += 1
+    ks = np.arange(MAX_RICE_PARAM + 1, dtype=np.int64)
+    sums = u.reshape(F, 1 << pmax, -1).sum(axis=2, dtype=np.int64)
+    best_bits = np.full(F, np.iinfo(np.int64).max)
+    best_p = np.zeros(F, dtype=np.int64)
+    best_k = np.zeros((F, 1 << MAX_PARTITION_ORDER), dtype=np.int64)
+    for p in range(pmax, -1, -1):
+        s = sums.reshape(F, 1 << p, -1).sum(axis=2)
+        count = np.full(1 << p, N >> p, dtype=np.int64)
+        count[0] -= order
+        cost = count[None, :, None] * (ks + 1) + (s[:, :, None] >> ks)
+        k = cost.argmin(axis=2)
+        bits = cost.min(axis=2).sum(axis=1) + 4 * (1 << p) + 6
+        better = bits < best_bits
+        best_bits = np.where(better, bits, best_bits)
+        best_p = np.where(better, p, best_p)
+        best_k[better, :1 << p] = k[better]
+    return best_bits, best_p, best_k
+
+
+def _fixed_residual(x: np.ndarray, order: int) -> np.ndarray:
+    r = x.copy()
+    for _ in range(order):
+        r[:, 1:] = np.diff(r, axis=1)
+    return r
+
+
+def _lpc_coefficients(x: np.ndarray, orders: Sequence[int]):
+    """Quantized LPC coefficients and shifts for every frame and order -> {order: (qlp, shift)}."""
+    F, N = x.shape
+    top = max(orders)
+    w = np.hanning(N + 2)[1:-1] if N > 2 else np.ones(N)
+    xw = x * w
+    R = np.stack([np.einsum("ij,ij->i", xw[:, lag:], xw[:, :N - lag]) for lag in range(top + 1)], axis=1)
+    R[:, 0] *= 1.0 + 1e-9  # tiny white-noise floor keeps the recursion stable
+    a = np.zeros((F, top))
+    err = R[:, 0].copy()
+    ok = err > 0
+    out = {}
+    for i in range(top):
+        acc = R[:, i + 1] - np.einsum("ij,ij->i", a[:, :i], R[:, i:0:-1])
+        k = np.divide(acc, err, out=np.zeros(F), where=ok)
+        a[:, :i] -= k[:, None] * a[:, :i][:, ::-1]
+        a[:, i] = k
+        err = err * (1.0 - k * k)
+        ok &= err > 0
+        if i + 1 in orders:
+            out[i + 1] = _quantize(a[:, :i + 1])
+    return out
+
+
+def _quantize(c: np.ndarray):
+    cmax = np.abs(c).max(axis=1)
+    exp = np.frexp(np.where(cmax > 0, cmax, 1.0))[1]
+    shift = np.clip(QLP_PRECISION - 1 - exp, 0, 15)
+    lim = (1 << (QLP_PRECISION - 1)) - 1
+    q = np.zeros(c.shape, dtype=np.int64)
+    err = np.zeros(c.shape[0])
+    scaled = c * np.exp2(shift)[:, None]
+    for j in range(c.shape[1]):
+        # error feedback keeps the quantized filter close to the real one
+        v = scaled[:, j] + err
+        q[:, j] = np.clip(np.round(v), -lim, lim)
+        err = v - q[:, j]
+    return q, shift.astype(np.int64)
+
+
+def _lpc_residual(x: np.ndarray, qlp: np.ndarray, shift: np.ndarray) -> np.ndarray:
+    F, N = x.shape
+    order = qlp.shape[1]
+    pred = np.zeros((F, N - order), dtype=np.int64)
+    for j in range(order):
+        pred += qlp[:, j:j + 1] * x[:, order - 1 - j:N - 1 - j]
+    r = x.copy()
+    r[:, order:] = x[:, order:] - (pred >> shift[:, None])
+    return r
+
+
+def _zigzag(r: np.ndarray, order: int) -> np.ndarray:
+    u = (r << 1) ^ (r >> 63)
+    u[:, :order] = 0
+    return u
+
+
+def _analyse(x: np.ndarray, bps: int) -> dict:
+    """Cheapest subframe for every frame of one channel signal x (F, N)."""
+    F, N = x.shape
+    verbatim = 8 + N * bps
+    best = {"bits": np.full(F, verbatim, dtype=np.int64), "kind": np.zeros(F, dtype=np.int64),
+            "order": np.zeros(F, dtype=np.int64), "res": np.zeros((F, N), dtype=np.int64),
+            "p": np.zeros(F, dtype=np.int64), "k": np.zeros((F, 1 << MAX_PARTITION_ORDER), dtype=np.int64),
+            "qlp": np.zeros((F, max(LPC_ORDERS)), dtype=np.int64), "shift": np.zeros(F, dtype=np.int64)}
+
+    def consider(kind, order, r, qlp=None, shift=None):
+        bits, p, k = _rice_plan(_zigzag(r, order), order)
+        bits = bits + 8 + order * bps
+        if qlp is not None:
+            bits = bits + 9 + order * QLP_PRECISION
+        m = bits < best["bits"]
+        if not m.any():
+            return
+        best["bits"][m] = bits[m]
+        best["kind"][m] = kind
+        best["order"][m] = order
+        best["res"][m] = r[m]
+        best["p"][m] = p[m]
+        best["k"][m] = k[m]
+        if qlp is not None:
+            best["qlp"][m, :order] = qlp[m]
+            best["shift"][m] = shift[m]
+
+    for order in range(min(4, N - 1) + 1):
+        consider(2, order, _fixed_residual(x, order))
+    orders = [o for o in LPC_ORDERS if o < N]
+    if orders:
+        for order, (qlp, shift) in _lpc_coefficients(x.astype(np.float64), orders).items():
+            consider(3, order, _lpc_residual(x, qlp, shift), qlp, shift)
+    constant = (x == x[:, :1]).all(axis=1)
+    best["bits"][constant] = 8 + bps
+    best["kind"][constant] = 1
+    return best
+
+
+def _subframe_fields(a: dict, f: int, x: np.ndarray, bps: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(values, widths) of frame f's subframe as chosen by _analyse."""
+    kind, order = int(a["kind"][f]), int(a["order"][f])
+    mask = (1 << bps) - 1
+    if kind == 1:  # constant
+        return np.array([0, int(x[0]) & mask], dtype=np.uint64), np.array([8, bps])
+    if kind == 0:  # verbatim
+        return (np.concatenate([[0b00000010], x & mask]).astype(np.uint64),
+                np.concatenate([[8], np.full(x.size, bps)]))
+    head = [((0b001000 | order) if kind == 2 else (0b100000 | (order - 1))) << 1]
+    widths = [8]
+    head += [int(v) & mask for v in x[:order]]
+    widths += [bps] * order
+    if kind == 3:
+        head += [QLP_PRECISION - 1, int(a["shift"][f])]
+        widths += [4, 5]
+        head += [int(c) & ((1 << QLP_PRECISION) - 1) for c in a["qlp"][f, :order]]
+        widths += [QLP_PRECISION] * order
+    p = int(a["p"][f])
+    head += [0, p]
+    widths += [2, 4]
+    # Rice-coded residual: a 4-bit parameter before each partition's samples
+    n = x.size
+    parts = 1 << p
+    k = a["k"][f, :parts]
+    count = np.full(parts, n >> p)
+    count[0] -= order
+    u = _zigzag(a["res"][f:f + 1], order)[0, order:]
+    kk = np.repeat(k, count)
+    q = u >> kk
+    vals = (np.int64(1) << kk) | (u & ((np.int64(1) << kk) - 1))
+    wid = q + 1 + kk
+    at = np.cumsum(count) - count
+    vals = np.insert(vals, at, k)
+    wid = np.insert(wid, at, 4)
+    return (np.concatenate([np.array(head, dtype=np.uint64), vals.astype(np.uint64)]),
+            np.concatenate([np.array(widths, dtype=np.int64), wid]))
+
+
+def encode_frames(pcm: np.ndarray, first_frame: int, sr: int, blocksize: int = BLOCKSIZE) -> Tuple[bytes, list]:
+    """Encode int16 frames (samples, channels) -> (FLAC frame bytes, size of each frame).
+
+    Every frame but the last holds blocksize samples; frame numbers start at first_frame.
+    """
+    n, channels = pcm.shape
+    full = n // blocksize
+    groups = [(0, full, blocksize)] if full else []
+    if n > full * blocksize:
+        groups.append((full * blocksize, 1, n - full * blocksize))
+    vals, widths, frame_bits = [], [], []
+    frame_no = first_frame
+    for start, count, size in groups:
+        x = pcm[start:start + count * size].astype(np.int64).reshape(count, size, channels)
+        chans = [np.ascontiguousarray(x[:, :, c]) for c in range(channels)]
+        if channels == 2:
+            left, right = chans
+            mid, side = (left + right) >> 1, left - right
+            an = {"L": _analyse(left, BPS), "R": _analyse(right, BPS),
+                  "M": _analyse(mid, BPS), "S": _analyse(side, BPS + 1)}
+            sig = {"L": left, "R": right, "M": mid, "S": side}
+            options = [(_INDEPENDENT, "L", "R"), (_LEFT_SIDE, "L", "S"),
+                       (_SIDE_RIGHT, "S", "R"), (_MID_SIDE, "M", "S")]
+            cost = np.stack([an[a]["bits"] + an[b]["bits"] for _, a, b in options])
+            choice = cost.argmin(axis=0)
+        else:
+            an = {c: _analyse(chans[c], BPS) for c in range(channels)}
+            sig = dict(enumerate(chans))
+            options = [(channels - 1, *range(channels))]
+            choice = np.zeros(count, dtype=np.int64)
+        for f in range(count):
+            assignment, *names = options[int(choice[f])]
+            header = _frame_header(frame_no, size, sr, assignment)
+            fv = [np.frombuffer(header, dtype=np.uint8).astype(np.uint64)]
+            fw = [np.full(len(header), 8, dtype=np.int64)]
+            for name in names:
+                bps = BPS + 1 if name == "S" else BPS
+                v, w = _subframe_fields(an[name], f, sig[name][f], bps)
+                fv.append(v)
+                fw.append(w)
+            bits = int(sum(int(w.sum()) for w in fw))
+            pad = -bits % 8
+            fv.append(np.zeros(1, dtype=np.uint64))
+            fw.append(np.array([pad], dtype=np.int64))
+            vals += fv
+            widths += fw
+            frame_bits.append(bits + pad)
+            frame_no += 1
+    bits = _expand_bits(np.concatenate(vals), np.concatenate(widths))
+    # CRC-16 of each frame: XOR of the terms at its set bits (distance from the frame end)
+    ends = np.cumsum(frame_bits)
+    ones = np.flatnonzero(bits)
+    frame_of = np.searchsorted(ends, ones, side="right")
+    terms = _CRC16[(ends[frame_of] - 1 - ones) % _CRC16.size]
+    starts = np.searchsorted(ones, ends - np.array(frame_bits))
+    crcs = np.bitwise_xor.reduceat(terms, starts)
+    data = np.packbits(bits).tobytes()
+    out, sizes, pos = [], [], 0
+    for nb, crc in zip(frame_bits, crcs):
+        nbytes = nb // 8
+        out.append(data[pos:pos + nbytes] + struct.pack(">H", int(crc)))
+        sizes.append(nbytes + 2)
+        pos += nbytes
+    return b"".join(out), sizes
+
+
+# ---------------- metadata ----------------
+def _block(kind: int, payload: bytes, last: bool) -> bytes:
+    return struct.pack(">I", (0x80000000 if last else 0) | (kind << 24) | len(payload)) + payload
+
+
+def vorbis_comment(fields: Sequence[Tuple[str, str]], vendor: str = "music4hz") -> bytes:
+    """VORBIS_COMMENT payload for (NAME, value) pairs (empty values skipped)."""
+    items = [f"{k}={v}".encode("utf-8") for k, v in fields if v]
+    out = struct.pack("<I", len(vendor)) + vendor.encode("utf-8") + struct.pack("<I", len(items))
+    return out + b"".join(struct.pack("<I", len(i)) + i for i in items)
+
+
+def picture(mime: str, data: bytes, desc: str = "Cover", kind: int = 3) -> bytes:
+    """PICTURE payload (front cover by default); PNG dimensions are read from the header."""
+    width = height = depth = 0
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 26:
+        width, height = struct.unpack(">II", data[16:24])
+        depth = data[24] * {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(data[25], 1)
+    m, d = mime.encode("ascii"), desc.encode("utf-8")
+    return (struct.pack(">II", kind, len(m)) + m + struct.pack(">I", len(d)) + d
+            + struct.pack(">IIIII", width, height, depth, 0, len(data)) + data)
+
+
+# ---------------- writer ----------------
+class FlacWriter:
+    """Incremental 16-bit FLAC writer with the WavWriter interface.
+
+    Float blocks are dithered and converted exactly as WavWriter does, so
+    the decoded PCM matches the WAV output bit for bit. ``metadata`` is a
+    sequence of (block type, payload) pairs, e.g. from sound.flac_metadata().
+    With ``workers`` > 1 batches of frames are encoded on a process pool.
+    STREAMINFO (length, frame sizes, MD5) is patched on close when the
+    output can seek; streams get the "unknown" values.
+    """
+
+    # Conversion piece size; same as WavWriter so the dither draws line up
+    _BUF_FRAMES = 1 << 16
+
+    def __init__(
+        self,
+        path,
+        sr: int = 44100,
+        channels: int = 2,
+        *,
+        dither: bool = True,
+        seed: int = 0,
+        metadata: Sequence[Tuple[int, bytes]] = (),
+        blocksize: int = BLOCKSIZE,
+        workers: int = 0,
+    ) -> None:
+        self.sr = int(sr)
+        self.channels = int(channels)
+        self.blocksize = int(blocksize)
+        self.dither = dither
+        self._rng = np.random.default_rng(seed)
+        self._batch = BATCH_FRAMES * self.blocksize
+        self._pcm = np.empty((self._batch, self.channels), dtype="<i2")
+        self._fill = 0
+        self._piece = np.empty((self._BUF_FRAMES, self.channels), dtype="<i2")
+        self._scratch = np.empty((self._BUF_FRAMES, self.channels), dtype=np.float32)
+        self._md5 = hashlib.md5()
+        self.frames = 0
+        self._frame_no = 0
+        self._sizes = [0, 0]
+        self._workers = int(workers)
+        self._pool = ProcessPoolExecutor(max_workers=self._workers) if self._workers > 1 else None
+        self._pending: deque = deque()
+        if isinstance(path, (str, os.PathLike)):
+            self.path = str(path)
+            self._f = open(path, "wb")
+            self._own = True
+        else:
+            self.path = getattr(path, "name", "<stream>")
+            self._f = path
+            self._own = False
+        try:
+            self._seekable = self._f.seekable() and (
+                self._own or stat.S_ISREG(os.fstat(self._f.fileno()).st_mode))
+        except (AttributeError, OSError, ValueError):
+            self._seekable = False
+        self._start = self._f.tell() if self._seekable else 0
+        blocks = list(metadata)
+        self._f.write(b"fLaC" + _block(_STREAMINFO, self._streaminfo(), not blocks))
+        for i, (kind, payload) in enumerate(blocks):
+            self._f.write(_block(kind, payload, i == len(blocks) - 1))
+
+    def _streaminfo(self) -> bytes:
+        lo, hi = self._sizes if self._seekable else (0, 0)
+        total = self.frames if self._seekable else 0
+        md5 = self._md5.digest() if self._seekable and self.frames else bytes(16)
+        block = min(self.blocksize, self.frames) if self.frames and self._seekable else self.blocksize
+        packed = (self.sr << 44) | ((self.channels - 1) << 41) | ((BPS - 1) << 36) | total
+        return struct.pack(">HH", block, self.blocksize) + lo.to_bytes(3, "big") + hi.to_bytes(3, "big") \
+            + packed.to_bytes(8, "big") + md5
+
+    def write(self, block: np.ndarray) -> None:
+        """Append a float block of shape (frames,) or (frames, channels)."""
+        if block.ndim == 1:
+            block = block[:, None]
+        if block.shape[1] != self.channels:
+            raise ValueError(f"Expected {self.channels} channel(s), got {block.shape[1]}")
+        for s in range(0, block.shape[0], self._BUF_FRAMES):
+            part = block[s:s + self._BUF_FRAMES]
+            m = part.shape[0]
+            pcm = to_pcm16(part, self._piece[:m], rng=self._rng if self.dither else None,
+                                 scratch=self._scratch[:m])
+            self._md5.update(pcm.tobytes())
+            self.frames += m
+            pos = 0
+            while pos < m:
+                take = min(m - pos, self._batch - self._fill)
+                self._pcm[self._fill:self._fill + take] = pcm[pos:pos + take]
+                self._fill += take
+                pos += take
+                if self._fill == self._batch:
+                    self._submit()
+
+    def _submit(self) -> None:
+        pcm = self._pcm[:self._fill].copy()
+        frames = -(-self._fill // self.blocksize)
+        if self._pool is None:
+            self._emit(encode_frames(pcm, self._frame_no, self.sr, self.blocksize))
+        else:
+            self._pending.append(self._pool.submit(encode_frames, pcm, self._frame_no, self.sr, self.blocksize))
+            while len(self._pending) > 2 * self._workers:
+                self._emit(self._pending.popleft().result())
+        self._frame_no += frames
+        self._fill = 0
+
+    def _emit(self, result) -> None:
+        data, sizes = result
+        self._f.write(data)
+        lo, hi = self._sizes
+        self._sizes = [min(sizes) if not lo else min(lo, min(sizes)), max(hi, max(sizes))]
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        try:
+            if self._fill:
+                self._submit()
+            while self._pending:
+                self._emit(self._pending.popleft().result())
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+        if self._seekable:
+            end = self._f.tell()
+            self._f.seek(self._start + 8)
+            self._f.write(self._streaminfo())
+            self._f.seek(end)
+        if self._own:
+            self._f.close()
+        else:
+            self._f.flush()
+
+    def __enter__(self) -> "FlacWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
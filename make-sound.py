@@ -1,10 +1,10 @@
-import sys
-import subprocess
 from pathlib import Path
 
+from batch import expand_manifest, run_batch
+
 # ===== Settings =====
 
-python_exe = Path(sys.executable).resolve()
+workers = 0  # 0 = one worker per CPU core
 amp = 0.35
 carrier = 400
 
@@ -47,50 +47,30 @@ artwork = ""  # e.g. r"E:\images\logo.png"
 title_prefix = ""  # e.g. "music4hz"
 
 # ===== Execution =====
-root = Path.cwd()
-out_root = root / "out"
-out_root.mkdir(exist_ok=True)
-
-def maybe_extend(cmd, flag, value):
-    if value:
-        cmd.extend([flag, str(value)])
-
-for s in sets:
-    band = s["band"]
-    band_out = out_root / band
-    band_out.mkdir(exist_ok=True)
-
-    for hz in s["freqs"]:
-        name = f"{band}_{hz}hz_iso.wav"
-        file_path = band_out / name
-
-        if file_path.exists():
-            print(f"!! Skipping {name} (already exists)")
-            continue
-
-        print(f">> Generating {name} ...")
-        cmd = [
-            str(python_exe), "sound.py",
-            "--mode", "iso",
-            "--freq", str(hz),                    # <-- was --theta
-            "--minutes", str(minutes[band]),
-            "--amp", str(amp),
-            "--iso-carrier", str(carrier),
-            "--out", str(band_out),
-        ]
-
-        # Optional metadata
-        maybe_extend(cmd, "--artist", artist)
-        maybe_extend(cmd, "--year", year)
-        maybe_extend(cmd, "--copyright", copyright_text)
-        maybe_extend(cmd, "--email", email)
-        maybe_extend(cmd, "--url", url)
-        maybe_extend(cmd, "--artwork", artwork)
-        maybe_extend(cmd, "--title-prefix", title_prefix)
+def build_manifest(out_root: Path) -> dict:
+    return {
+        "out": str(out_root),
+        "bands": minutes,
+        "defaults": {
+            "kind": "tone",
+            "mode": "iso",
+            "amp": amp,
+            "iso_carrier": carrier,
+            "artist": artist,
+            "year": year,
+            "copyright": copyright_text,
+            "email": email,
+            "url": url,
+            "artwork": artwork,
+            "title_prefix": title_prefix,
+        },
+        "jobs": [{"band": s["band"], "freqs": list(s["freqs"])} for s in sets],
+    }
 
-        result = subprocess.run(cmd)
-        if result.returncode != 0:
-            print(f"!! Failed: {name}")
-            break
 
-print(f"\nDone. Files under: {out_root}")
+if __name__ == "__main__":
+    out_root = Path.cwd() / "out"
+    out_root.mkdir(exist_ok=True)
+    jobs = expand_manifest(build_manifest(out_root))
+    run_batch(jobs, workers=workers or None)
+    print(f"\nDone. Files under: {out_root}")
@@ -0,0 +1,137 @@
+"""
+pcm_stream.py — stream rendered audio to stdout or a named pipe
+
+A producer thread renders blocks into a bounded queue while the caller's
+thread converts them to 16-bit PCM and writes them out, so rendering and
+pipe I/O overlap and memory stays at a few blocks whatever the track length.
+
+Example:
+  python app.py bg --name rain --minutes 480 --stream | ffmpeg -i - -c:a libopus rain.opus
+  python app.py tone --mode iso --freq 4 --stream fifo:/tmp/tone.fifo --stream-format raw
+"""
+
+from __future__ import annotations
+import os
+import queue
+import stat
+import sys
+import threading
+import time
+from typing import BinaryIO, Iterable
+
+import numpy as np
+
+# Blocks buffered between the renderer and the writer
+DEFAULT_QUEUE_BLOCKS = 8
+
+_END = object()
+
+
+def open_sink(target: str) -> BinaryIO:
+    """"-" -> stdout; "fifo:PATH" -> named pipe, created (POSIX) if missing; PATH -> existing pipe.
+
+    Anything else raises ValueError: streaming into a regular file is what
+    --out is for, and a pipe nobody reads would block forever.
+    """
+    if target in ("", "-"):
+        return sys.stdout.buffer
+    create = target.startswith("fifo:")
+    path = target[len("fifo:"):] if create else target
+    if create and not os.path.exists(path):
+        if not hasattr(os, "mkfifo"):
+            raise ValueError("named pipes are not supported on this platform; stream to '-'")
+        os.mkfifo(path)
+    if os.path.exists(path) and not _is_fifo(path):
+        raise ValueError(f"stream target '{path}' is not a named pipe: write regular files with --out")
+    if not os.path.exists(path):
+        raise ValueError(f"stream target '{path}' does not exist: use '-' (stdout), 'fifo:{path}' "
+                         f"to create a named pipe, or --out to write a regular file")
+    # Opening a FIFO blocks until a reader connects
+    return open(path, "wb", buffering=0)
+
+
+def _is_fifo(path: str) -> bool:
+    try:
+        return stat.S_ISFIFO(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def pump(blocks: Iterable[np.ndarray], writer, *, queue_blocks: int = DEFAULT_QUEUE_BLOCKS,
+         sr: int = 44100) -> dict:
+    """Render blocks on a producer thread and write them through writer (e.g. a WavWriter).
+
+    Yielded blocks may be reused buffers, so each one is copied into the
+    queue. Stops quietly when the reader goes away (BrokenPipeError).
+    Returns per-block timing: frames, render seconds, start-up and worst
+    steady-state block latency, and the realtime factor (audio seconds per
+    render second).
+    """
+    q: queue.Queue = queue.Queue(maxsize=max(1, int(queue_blocks)))
+    stop = threading.Event()
+    stats = {"blocks": 0, "frames": 0, "render_sec": 0.0, "first_block_ms": 0.0, "max_block_ms": 0.0}
+    error: list[BaseException] = []
+
+    def produce():
+        try:
+            it = iter(blocks)
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                blk = next(it, None)
+                if blk is None:
+                    break
+                blk = np.array(blk, dtype=np.float32, copy=True)
+                dt = time.perf_counter() - t0
+                stats["render_sec"] += dt
+                # the first block also pays start-up (e.g. the normalizer's peak scan)
+                if not stats["first_block_ms"]:
+                    stats["first_block_ms"] = dt * 1000.0
+                else:
+                    stats["max_block_ms"] = max(stats["max_block_ms"], dt * 1000.0)
+                while not stop.is_set():
+                    try:
+                        q.put(blk, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        except BaseException as e:  # re-raised in the writer thread
+            error.append(e)
+        finally:
+            while True:
+                try:
+                    q.put(_END, timeout=0.1)
+                    break
+                except queue.Full:
+                    if stop.is_set():
+                        break
+
+    t_start = time.perf_counter()
+    producer = threading.Thread(target=produce, name="pcm-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            blk = q.get()
+            if blk is _END:
+                break
+            writer.write(blk)
+            stats["blocks"] += 1
+            stats["frames"] += blk.shape[0]
+    except BrokenPipeError:
+        stats["broken_pipe"] = True
+    finally:
+        stop.set()
+        producer.join()
+    if error:
+        raise error[0]
+
+    stats["wall_sec"] = time.perf_counter() - t_start
+    audio_sec = stats["frames"] / float(sr)
+    stats["realtime_x"] = audio_sec / stats["render_sec"] if stats["render_sec"] > 0 else float("inf")
+    return stats
+
+
+def report(stats: dict, file=sys.stderr) -> None:
+    print(f"~ streamed {stats['frames']} frames in {stats['blocks']} blocks | "
+          f"render {stats['realtime_x']:.0f}x realtime | first block {stats['first_block_ms']:.0f} ms | "
+          f"worst block {stats['max_block_ms']:.1f} ms"
+          + (" | reader closed" if stats.get("broken_pipe") else ""), file=file)
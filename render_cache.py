@@ -0,0 +1,158 @@
+"""
+render_cache.py — content-addressed cache of rendered audio files
+
+Every output is keyed on a hash of its fully resolved render spec (profile
+content, seed, level, minutes, sample rate, tone parameters, metadata) plus
+a hash of the rendering source code, so editing a profile or an operator
+invalidates old entries automatically. Entries are stored read-only with a
+sha256 of their content, which is checked on every hit; hits are copied
+into the output path (hard-linked only with link=True), so tagging or
+editing an output never touches the cache. The cache is capped in size with
+LRU eviction.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import stat
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Optional
+
+BASE = Path(__file__).resolve().parent
+
+# Source files whose content defines the rendered audio
+_CODE_GLOBS = ("bg_utils.py", "sound.py", "wav_io.py", "flac_writer.py", "bg_core/*.py", "bg_core/ops/*.py")
+
+DEFAULT_DIR = Path(os.environ.get("MUSIC4HZ_CACHE", Path.home() / ".cache" / "music4hz"))
+DEFAULT_MAX_BYTES = 20 * 1024**3
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """Hash of all rendering source files (changes whenever operator code changes)."""
+    h = hashlib.sha256()
+    for pattern in _CODE_GLOBS:
+        for path in sorted(BASE.glob(pattern)):
+            h.update(path.relative_to(BASE).as_posix().encode())
+            h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's content ("" if missing)."""
+    if not path or not os.path.exists(path):
+        return ""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _remove(path: Path) -> None:
+    # Cache entries are read-only; Windows refuses to unlink those
+    try:
+        os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+    except OSError:
+        pass
+    path.unlink(missing_ok=True)
+
+
+def meta_spec(meta: dict) -> dict:
+    """Metadata kwargs for wav_metadata -> hashable spec (artwork by content)."""
+    spec = {k: v for k, v in meta.items() if k != "artwork_path"}
+    spec["artwork"] = file_digest(meta.get("artwork_path", ""))
+    return spec
+
+
+class RenderCache:
+    """Directory of <key>.<ext> audio files plus <key>.json specs, capped at max_bytes."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES, link: bool = False):
+        self.root = Path(root) if root else DEFAULT_DIR
+        self.max_bytes = int(max_bytes)
+        self.link = link
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def key(self, spec: dict) -> str:
+        payload = json.dumps({"spec": spec, "code": code_version()}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str, ext: str) -> tuple[Path, Path]:
+        return self.root / f"{key}{ext or '.wav'}", self.root / f"{key}.json"
+
+    def _place(self, src: Path, dest: Path, *, link: bool) -> None:
+        if dest.exists() and os.path.samefile(src, dest):
+            return
+        tmp = dest.with_name(dest.name + ".tmp")
+        _remove(tmp)
+        try:
+            if not link:
+                raise OSError
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+
+    def fetch(self, spec: dict, dest: str) -> bool:
+        """Place a cached render at dest -> True on hit."""
+        key = self.key(spec)
+        audio, meta = self._paths(key, Path(dest).suffix)
+        if not (audio.exists() and meta.exists()):
+            return False
+        try:
+            stored = json.loads(meta.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            stored = {}
+        expected = {"spec": json.loads(json.dumps(spec, default=str)), "code": code_version()}
+        if ({k: stored.get(k) for k in expected} != expected
+                or stored.get("sha256") != file_digest(str(audio))):
+            # Stale, corrupt or modified entry: drop it
+            _remove(audio)
+            _remove(meta)
+            return False
+        self._place(audio, Path(dest), link=self.link)
+        os.utime(audio)  # LRU: mark as recently used
+        return True
+
+    def store(self, spec: dict, src: str) -> None:
+        """Add a finished render to the cache, then evict down to max_bytes."""
+        key = self.key(spec)
+        audio, meta = self._paths(key, Path(src).suffix)
+        _remove(audio)
+        self._place(Path(src), audio, link=False)
+        os.chmod(audio, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+        meta.write_text(json.dumps({"spec": spec, "code": code_version(), "sha256": file_digest(str(audio))},
+                                   sort_keys=True, default=str), encoding="utf-8")
+        self.evict(keep=key)
+
+    def evict(self, keep: str = "") -> None:
+        entries = sorted((p for p in self.root.iterdir() if p.suffix not in (".json", ".tmp")),
+                         key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in entries)
+        for audio in entries:
+            if total <= self.max_bytes:
+                break
+            if audio.stem == keep:
+                continue
+            total -= audio.stat().st_size
+            _remove(audio)
+            _remove(audio.with_suffix(".json"))
+
+
+def cached_render(cache: Optional[RenderCache], spec: dict, dest: str, render: Callable[[str], None]) -> bool:
+    """Fetch dest from cache, or run render(dest) and store the result. Returns True on a hit."""
+    # Never write through an existing file: it may be a hard link into the cache
+    if cache is None or spec.get("seed", 0) is None:
+        _remove(Path(dest))
+        render(dest)
+        return False
+    if cache.fetch(spec, dest):
+        return True
+    _remove(Path(dest))
+    render(dest)
+    cache.store(spec, dest)
+    return False
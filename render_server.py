@@ -0,0 +1,381 @@
+"""
+render_server.py — long-running asyncio render daemon
+
+Keeps a process pool of warm workers (NumPy, mutagen, every bg_core op and
+parsed profiles already loaded) and serves render jobs over a small HTTP/1.1
+API on TCP or a Unix socket. Jobs use the batch manifest format (see batch.py):
+
+  POST /jobs                 {"kind": "bg", "name": "sea", "minutes": 60, "seed": 42}
+                             {"kind": "tone", "freq": 4, "minutes": 30, "mode": "both"}
+                             -> 202 {"id": ..., "status": "queued"}   (503 when the queue is full)
+  GET  /jobs                 -> status of every job
+  GET  /jobs/<id>            -> {"status": "queued|running|done|failed", "outputs": [...], ...}
+  GET  /jobs/<id>/result/<i> -> output file i, streamed (409 until the job is done)
+  GET  /health               -> queue depth and worker count
+
+Outputs always go to <out>/<id>/: "out", "profiles_dir" are set by the server,
+"artwork" is rejected, and "band" / "name" may only use [A-Za-z0-9_-].
+Only the newest --keep finished jobs stay in the job table.
+
+Example:
+  python render_server.py --port 8765 --workers 4
+  python render_server.py --unix /tmp/music4hz.sock
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from batch import _outputs, expand_manifest, render_job
+
+# Bytes per write when streaming a result file
+_CHUNK = 1 << 20
+# Largest accepted request body (job specs are small JSON objects)
+_MAX_BODY = 1 << 20
+# Manifest keys a client may not set: paths on the server's filesystem
+_SERVER_KEYS = ("artwork",)
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+            409: "Conflict", 503: "Service Unavailable"}
+
+
+def _warm(profiles_dir: str = "") -> None:
+    # Pool initializer: pay import / first-call costs once per worker
+    import sound  # noqa: F401
+    from bg_core.engine import load_profile
+    try:
+        import mutagen.wave  # noqa: F401
+    except ImportError:
+        pass
+    from bg_core.registry import _OPS, get_processor
+
+    for name in _OPS:
+        get_processor(name)
+    # Parse every profile into load_profile's cache (re-read later only if the file changes)
+    for path in sorted(Path(profiles_dir).glob("*.json")) if profiles_dir else ():
+        try:
+            load_profile(str(path))
+        except (OSError, ValueError):
+            pass  # a broken profile fails its own jobs, not the pool
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class RenderService:
+    """Job table, bounded queue and process pool behind the HTTP API."""
+
+    def __init__(self, *, workers: Optional[int] = None, queue_size: int = 64,
+                 out_root: str = "out/server", profiles_dir: str = "profiles", keep: int = 1024):
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, int(queue_size)))
+        self.out_root = Path(out_root)
+        self.profiles_dir = profiles_dir
+        self.jobs: dict[str, dict] = {}
+        self.keep = max(0, int(keep))
+        self._ids = itertools.count(1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._runners: list[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # ---- lifecycle ----
+    async def start(self, *, host: str = "127.0.0.1", port: int = 8765, unix: str = "") -> None:
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm,
+                                         initargs=(str(self.profiles_dir),))
+        self._runners = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        if unix:
+            self._server = await asyncio.start_unix_server(self._handle, path=unix)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+
+    @property
+    def address(self):
+        """(host, port) of the TCP listener, or the Unix socket path."""
+        return self._server.sockets[0].getsockname()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._runners:
+            task.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    async def __aenter__(self) -> "RenderService":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    # ---- jobs ----
+    def submit(self, spec: dict) -> dict:
+        """Queue one manifest entry -> its job record (HttpError 503 when full)."""
+        if not isinstance(spec, dict):
+            raise HttpError(400, "job spec must be a JSON object")
+        banned = [k for k in _SERVER_KEYS if k in spec]
+        if banned:
+            raise HttpError(400, f"job spec may not set {', '.join(banned)}")
+        job_id = f"{next(self._ids):06d}"
+        out_dir = self.out_root / job_id
+        entry = {**spec, "out": str(out_dir), "profiles_dir": self.profiles_dir}
+        try:
+            tasks = expand_manifest({"out": str(out_dir), "jobs": [entry]})
+            paths = [p for task in tasks for p in _outputs(task)]
+        except (KeyError, ValueError, TypeError) as e:
+            raise HttpError(400, f"invalid job spec: {type(e).__name__}: {e}")
+        root = out_dir.resolve()
+        if not all(p.resolve().is_relative_to(root) for p in paths):
+            raise HttpError(400, "invalid job spec: output path escapes the job directory")
+        job = {"id": job_id, "status": "queued", "spec": spec, "outputs": [], "error": "",
+               "submitted": time.time(), "seconds": 0.0, "_tasks": tasks}
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise HttpError(503, "render queue is full", {"Retry-After": "5"})
+        self.jobs[job_id] = job
+        return job
+
+    def _expire(self) -> None:
+        # Drop the oldest finished jobs beyond `keep` (queued / running ones always stay)
+        done = [k for k, j in self.jobs.items() if j["status"] in ("done", "failed")]
+        for job_id in done[:max(0, len(done) - self.keep)]:
+            del self.jobs[job_id]
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job["status"] = "running"
+            t0 = time.perf_counter()
+            try:
+                for task in job["_tasks"]:
+                    result = await loop.run_in_executor(self._pool, render_job, task)
+                    if not result["ok"]:
+                        job["status"], job["error"] = "failed", result["error"]
+                        break
+                    job["outputs"].extend(result["outputs"])
+                else:
+                    job["status"] = "done"
+            except Exception as e:  # pool died, etc.
+                job["status"], job["error"] = "failed", f"{type(e).__name__}: {e}"
+            finally:
+                job["seconds"] = time.perf_counter() - t0
+                self.queue.task_done()
+                self._expire()
+
+    @staticmethod
+    def public(job: dict) -> dict:
+        return {k: v for k, v in job.items() if not k.startswith("_")}
+
+    # ---- HTTP ----
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, body = await _read_request(reader)
+            await self._route(method, path, body, writer)
+        except HttpError as e:
+            await _send_json(writer, e.status, {"error": str(e)}, e.headers)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+        if method == "GET" and parts == ["health"]:
+            return await _send_json(writer, 200, {"ok": True, "workers": self.workers,
+                                                  "queued": self.queue.qsize(), "jobs": len(self.jobs)})
+        if parts[:1] != ["jobs"]:
+            raise HttpError(404, f"no route for {path}")
+        if method == "POST" and len(parts) == 1:
+            try:
+                spec = json.loads(body or b"{}")
+            except ValueError as e:
+                raise HttpError(400, f"invalid JSON: {e}")
+            return await _send_json(writer, 202, self.public(self.submit(spec)))
+        if method != "GET":
+            raise HttpError(404, f"no route for {method} {path}")
+        if len(parts) == 1:
+            return await _send_json(writer, 200, [self.public(j) for j in self.jobs.values()])
+        job = self.jobs.get(parts[1])
+        if job is None:
+            raise HttpError(404, f"unknown job {parts[1]}")
+        if len(parts) == 2:
+            return await _send_json(writer, 200, self.public(job))
+        if len(parts) == 4 and parts[2] == "result":
+            if job["status"] != "done":
+                raise HttpError(409, f"job {job['id']} is {job['status']}")
+            try:
+                out = Path(job["outputs"][int(parts[3])])
+            except (ValueError, IndexError):
+                raise HttpError(404, f"job {job['id']} has no output {parts[3]}")
+            return await _send_file(writer, out)
+        raise HttpError(404, f"no route for {path}")
+
+
+async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+    line = (await reader.readline()).decode("latin-1").strip()
+    try:
+        method, path, _ = line.split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+    length = None
+    while True:
+        header = (await reader.readline()).decode("latin-1").strip()
+        if not header:
+            break
+        name, _, value = header.partition(":")
+        if name.strip().lower() == "content-length":
+            value = value.strip()
+            if not value.isdigit():
+                raise HttpError(400, f"malformed Content-Length: {value!r}")
+            length = int(value)
+    method = method.upper()
+    if length is None:
+        if method == "POST":
+            raise HttpError(400, "missing Content-Length")
+        length = 0
+    if length > _MAX_BODY:
+        raise HttpError(400, f"request body too large ({length} > {_MAX_BODY} bytes)")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, body
+
+
+def _head(status: int, headers: dict) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+    lines += [f"{k}: {v}" for k, v in {**headers, "Connection": "close"}.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, payload, headers: Optional[dict] = None) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(_head(status, {"Content-Type": "application/json", "Content-Length": len(body),
+                                **(headers or {})}))
+    writer.write(body)
+    await writer.drain()
+
+
+async def _send_file(writer: asyncio.StreamWriter, path: Path) -> None:
+    ctype = "audio/flac" if path.suffix == ".flac" else "audio/wav"
+    writer.write(_head(200, {"Content-Type": ctype, "Content-Length": path.stat().st_size,
+                             "Content-Disposition": f'attachment; filename="{path.name}"'}))
+    loop = asyncio.get_running_loop()
+    with open(path, "rb") as f:
+        while True:
+            chunk = await loop.run_in_executor(None, f.read, _CHUNK)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+
+
+class RenderClient:
+    """Minimal asyncio client for the render daemon (TCP host/port or Unix socket)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, *, unix: str = ""):
+        self.host, self.port, self.unix = host, int(port), unix
+
+    async def _request(self, method: str, path: str, payload=None, sink=None):
+        if self.unix:
+            reader, writer = await asyncio.open_unix_connection(self.unix)
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: music4hz\r\nContent-Length: {len(body)}\r\n\r\n"
+                     .encode("latin-1") + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = None
+        while True:
+            header = (await reader.readline()).decode("latin-1").strip()
+            if not header:
+                break
+            name, _, value = header.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        try:
+            if sink is not None and status == 200:
+                while True:
+                    chunk = await reader.read(_CHUNK)
+                    if not chunk:
+                        break
+                    sink.write(chunk)
+                return status, None
+            data = await (reader.readexactly(length) if length is not None else reader.read())
+            return status, json.loads(data) if data else None
+        finally:
+            writer.close()
+
+    async def submit(self, spec: dict) -> dict:
+        status, data = await self._request("POST", "/jobs", spec)
+        if status != 202:
+            raise RuntimeError(f"submit failed ({status}): {data}")
+        return data
+
+    async def status(self, job_id: str) -> dict:
+        return (await self._request("GET", f"/jobs/{job_id}"))[1]
+
+    async def wait(self, job_id: str, poll: float = 0.2) -> dict:
+        while True:
+            job = await self.status(job_id)
+            if job["status"] in ("done", "failed"):
+                return job
+            await asyncio.sleep(poll)
+
+    async def fetch(self, job_id: str, index: int, dest: str) -> str:
+        """Stream output index of a finished job into dest."""
+        with open(dest, "wb") as f:
+            status, data = await self._request("GET", f"/jobs/{job_id}/result/{index}", sink=f)
+        if status != 200:
+            raise RuntimeError(f"fetch failed ({status}): {data}")
+        return dest
+
+
+async def serve(args: argparse.Namespace) -> None:
+    service = RenderService(workers=args.workers or None, queue_size=args.queue,
+                            out_root=args.out, profiles_dir=args.profiles_dir, keep=args.keep)
+    await service.start(host=args.host, port=args.port, unix=args.unix)
+    print(f"> music4hz render server on {args.unix or service.address} "
+          f"({service.workers} worker(s), queue {args.queue})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.stop()
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="music4hz - render daemon")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--unix", default="", help="Listen on this Unix socket instead of TCP")
+    p.add_argument("--workers", type=int, default=0, help="Worker processes (0 = CPU count)")
+    p.add_argument("--queue", type=int, default=64, help="Queued jobs before new submissions get 503")
+    p.add_argument("--out", default="out/server", help="Output root (one sub-directory per job)")
+    p.add_argument("--profiles-dir", default="profiles")
+    p.add_argument("--keep", type=int, default=1024, help="Finished jobs kept in the job table")
+    args = p.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
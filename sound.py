@@ -1,19 +1,188 @@
-"""Generate tones as binaural or isochronic audio and write WAV files.
+"""Generate tones as binaural or isochronic audio and write WAV or FLAC files.
 
 This script synthesizes binaural and isochronic tones at a given beat frequency
-and saves them as 16-bit PCM WAV files, embedding metadata (title, artist,
-copyright, email, website, and optional artwork).
+and saves them as 16-bit PCM WAV (or FLAC) files, embedding metadata (title,
+artist, copyright, email, website, and optional artwork).
 """
 
 import argparse
+import io
 import os
-import wave
+import stat
+import struct
 import mimetypes
-from typing import Tuple
+from contextlib import ExitStack, nullcontext
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Sequence, Tuple
 import numpy as np
 
+from wav_io import MAX_RIFF, to_pcm16, wav_header
+
+# Frames synthesized per block by the oscillator bank
+TONE_BLOCK = 1 << 16
+
+# Tone outputs that can be requested from make() / tone_blocks()
+MODES = ("binaural", "iso")
+
+# Output container formats understood by open_writer()
+FORMATS = ("wav", "flac")
+
+
+# --- WAV metadata: ID3 + LIST/INFO chunks ---
+_ID3_FRAMES = ("TIT2", "TPE1", "COMM", "TDRC", "TCOP", "WOAF", "APIC")
+
+
+def _comment_text(comment: str, email: str, url: str) -> str:
+    # Visible comment, each item on its own line
+    parts = []
+    if comment:
+        parts.append(comment)
+    if email:
+        parts.append(f"Email: {email}")
+    if url:
+        parts.append(f"Website: {url}")
+    return "\n".join(parts)
+
+
+def _artwork_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+@lru_cache(maxsize=8)
+def _read_artwork(path: str, stamp: Tuple[int, int]) -> Tuple[str, bytes]:
+    """(mime, bytes) of a cover image; cached per (path, mtime, size) so a batch reads it once."""
+    mime, _ = mimetypes.guess_type(path)
+    if mime is None:
+        ext = os.path.splitext(path)[1].lower()
+        mime = "image/png" if ext == ".png" else "image/jpeg"
+    with open(path, "rb") as f:
+        return mime, f.read()
+
+
+def _artwork(path: str) -> Optional[Tuple[str, bytes]]:
+    stamp = _artwork_stamp(path) if path else None
+    return _read_artwork(path, stamp) if stamp is not None else None
+
+
+def _id3_frames(title, artist, comment_text, year, copyright_, url, artwork) -> list:
+    from mutagen.id3 import TIT2, TPE1, COMM, TDRC, TCOP, WOAF, APIC
+
+    frames = []
+    if title:
+        frames.append(TIT2(encoding=3, text=title))
+    if artist:
+        frames.append(TPE1(encoding=3, text=artist))
+    if comment_text:
+        frames.append(COMM(encoding=3, lang="eng", desc="", text=comment_text))
+    if year:
+        frames.append(TDRC(encoding=3, text=year))
+    if copyright_:
+        frames.append(TCOP(encoding=3, text=copyright_))
+    if url:
+        frames.append(WOAF(encoding=3, url=url))
+    if artwork is not None:
+        mime, img = artwork
+        frames.append(APIC(encoding=3, mime=mime, type=3, desc="Cover", data=img))
+    return frames
+
+
+def _chunk(cid: bytes, payload: bytes) -> bytes:
+    # RIFF chunks are word aligned: odd payloads get a pad byte
+    return cid + struct.pack("<I", len(payload)) + payload + (b"\0" if len(payload) & 1 else b"")
+
+
+@lru_cache(maxsize=64)
+def _encode_metadata(title, artist, comment, year, copyright_, url, email, artwork_path, stamp) -> bytes:
+    comment_text = _comment_text(comment, email, url)
+    info = b""
+    for cid, text in ((b"INAM", title), (b"IART", artist), (b"ICMT", comment_text),
+                      (b"ICRD", year), (b"ICOP", copyright_)):
+        if text:
+            info += _chunk(cid, text.encode("utf-8") + b"\0")
+    chunks = _chunk(b"LIST", b"INFO" + info) if info else b""
+    artwork = None
+    if stamp is not None:
+        try:
+            artwork = _read_artwork(artwork_path, stamp)
+        except Exception as e:
+            print(f"[meta] Skipped artwork {artwork_path}: {e}")
+    try:
+        from mutagen.id3 import ID3
+
+        tags = ID3()
+        for frame in _id3_frames(title, artist, comment_text, year, copyright_, url, artwork):
+            tags.add(frame)
+        if len(tags):
+            buf = io.BytesIO()
+            tags.save(buf, v1=0, padding=lambda info: 0)
+            chunks += _chunk(b"id3 ", buf.getvalue())
+    except Exception as e:
+        print(f"[meta] Skipped ID3 tags: {e}")
+    return chunks
+
+
+def wav_metadata(
+    *,
+    title: str = "",
+    artist: str = "",
+    comment: str = "",
+    year: str = "",
+    copyright_: str = "",
+    url: str = "",
+    email: str = "",
+    artwork_path: str = "",
+) -> bytes:
+    """Pre-encoded LIST/INFO + ID3 chunks for WavWriter(metadata=...).
+
+    Takes the same arguments as set_wav_metadata. Encoded chunks and the
+    artwork bytes are cached, so tracks of a batch sharing metadata reuse
+    them; the ID3 chunk is skipped (with a message) if mutagen is missing.
+    """
+    stamp = _artwork_stamp(artwork_path) if artwork_path else None
+    return _encode_metadata(title, artist, comment, year, copyright_, url, email, artwork_path, stamp)
+
+
+@lru_cache(maxsize=64)
+def _encode_flac_metadata(title, artist, comment, year, copyright_, url, email, artwork_path, stamp):
+    from flac_writer import picture, vorbis_comment
+
+    fields = [("TITLE", title), ("ARTIST", artist), ("COMMENT", _comment_text(comment, email, url)),
+              ("DATE", year), ("COPYRIGHT", copyright_), ("CONTACT", url)]
+    blocks = [(4, vorbis_comment(fields))]
+    if stamp is not None:
+        try:
+            mime, img = _read_artwork(artwork_path, stamp)
+            blocks.append((6, picture(mime, img)))
+        except Exception as e:
+            print(f"[meta] Skipped artwork {artwork_path}: {e}")
+    return tuple(blocks)
+
+
+def flac_metadata(
+    *,
+    title: str = "",
+    artist: str = "",
+    comment: str = "",
+    year: str = "",
+    copyright_: str = "",
+    url: str = "",
+    email: str = "",
+    artwork_path: str = "",
+) -> Tuple[Tuple[int, bytes], ...]:
+    """Pre-encoded VORBIS_COMMENT + PICTURE blocks for FlacWriter(metadata=...); cached like wav_metadata."""
+    stamp = _artwork_stamp(artwork_path) if artwork_path else None
+    return _encode_flac_metadata(title, artist, comment, year, copyright_, url, email, artwork_path, stamp)
+
+
+def track_metadata(fmt: str = "wav", **meta):
+    """wav_metadata() or flac_metadata() for the output format."""
+    return flac_metadata(**meta) if fmt == "flac" else wav_metadata(**meta)
+
 
-# --- WAV metadata via ID3-in-WAV (mutagen) ---
 def set_wav_metadata(
     path: str,
     *,
@@ -26,13 +195,14 @@ def set_wav_metadata(
     email: str = "",
     artwork_path: str = "",
 ) -> bool:
-    """Attach metadata (and optional artwork) to a WAV file. Non-fatal on failure."""
+    """Attach metadata (and optional artwork) to an existing WAV file. Non-fatal on failure.
+
+    This rewrites the file through mutagen; for new files pass
+    wav_metadata(...) to WavWriter instead, which writes it in the same pass.
+    """
     try:
         from mutagen.wave import WAVE
-        from mutagen.id3 import (
-            ID3NoHeaderError,
-            TIT2, TPE1, COMM, TDRC, TCOP, WOAF, APIC,
-        )
+        from mutagen.id3 import ID3NoHeaderError
 
         audio = WAVE(path)
         try:
@@ -43,46 +213,18 @@ def set_wav_metadata(
             audio.add_tags()
 
         # Clear frames we set
-        for frame in ("TIT2", "TPE1", "COMM", "TDRC", "TCOP", "WOAF", "APIC"):
+        for frame in _ID3_FRAMES:
             audio.tags.delall(frame)
 
-        # Build a visible comment (each item on its own line)
-        parts = []
-        if comment:
-            parts.append(comment)
-        if email:
-            parts.append(f"Email: {email}")
-        if url:
-            parts.append(f"Website: {url}")
-        comment_text = "\n".join(parts) if parts else ""
-
-        if title:
-            audio.tags.add(TIT2(encoding=3, text=title))
-        if artist:
-            audio.tags.add(TPE1(encoding=3, text=artist))
-        if comment_text:
-            audio.tags.add(COMM(encoding=3, lang="eng", desc="", text=comment_text))
-        if year:
-            audio.tags.add(TDRC(encoding=3, text=year))
-        if copyright_:
-            audio.tags.add(TCOP(encoding=3, text=copyright_))
-        if url:
-            audio.tags.add(WOAF(encoding=3, url=url))
-
-        # Artwork (optional)
-        if artwork_path and os.path.exists(artwork_path):
+        artwork = None
+        if artwork_path:
             try:
-                mime, _ = mimetypes.guess_type(artwork_path)
-                if mime is None:
-                    ext = os.path.splitext(artwork_path)[1].lower()
-                    mime = "image/png" if ext == ".png" else "image/jpeg"
-                with open(artwork_path, "rb") as f:
-                    img = f.read()
-                audio.tags.add(
-                    APIC(encoding=3, mime=mime, type=3, desc="Cover", data=img)
-                )
+                artwork = _artwork(artwork_path)
             except Exception as e:
                 print(f"[meta] Skipped artwork for {path}: {e}")
+        comment_text = _comment_text(comment, email, url)
+        for frame in _id3_frames(title, artist, comment_text, year, copyright_, url, artwork):
+            audio.tags.add(frame)
 
         audio.save()
         return True
@@ -91,16 +233,291 @@ def set_wav_metadata(
         return False
 
 
-def save_wav(path: str, data: np.ndarray, sr: int = 44100) -> None:
+class WavWriter:
+    """Incremental 16-bit PCM WAV writer.
+
+    Float blocks in [-1, 1] are dithered (TPDF; exact zeros stay zero) and
+    converted into a reused int16 buffer, then appended to the file as they
+    arrive. The RIFF sizes are patched on close; files whose data exceeds the
+    4 GB RIFF limit are rewritten in place as RF64 (the reserved JUNK chunk becomes ``ds64``).
+
+    ``metadata`` holds pre-encoded chunks (see wav_metadata()) written
+    between ``fmt `` and ``data``, so tags cost no second pass over the file.
+
+    ``path`` may also be an open binary stream (stdout, a named pipe). Such
+    streams are left open; when they cannot seek, the header carries the
+    0xFFFFFFFF "unknown length" sizes used for streamed WAV. ``raw=True``
+    writes bare interleaved PCM without any header.
+    """
+
+    _BUF_FRAMES = 1 << 16
+    _MAX_RIFF = MAX_RIFF
+
+    def __init__(
+        self,
+        path: str,
+        sr: int = 44100,
+        channels: int = 2,
+        *,
+        dither: bool = True,
+        seed: int = 0,
+        raw: bool = False,
+        metadata: bytes = b"",
+    ) -> None:
+        self.sr = int(sr)
+        self.channels = int(channels)
+        self.dither = dither
+        self._rng = np.random.default_rng(seed)
+        self._scratch = np.empty((self._BUF_FRAMES, self.channels), dtype=np.float32)
+        self._pcm = np.empty((self._BUF_FRAMES, self.channels), dtype="<i2")
+        self.frames = 0
+        self.raw = raw
+        self.metadata = bytes(metadata)
+        if isinstance(path, (str, os.PathLike)):
+            self.path = str(path)
+            self._f = open(path, "wb")
+            self._own = True
+        else:
+            self.path = getattr(path, "name", "<stream>")
+            self._f = path
+            self._own = False
+        try:
+            # only regular files can be patched (/dev/null "seeks" but tell() stays 0)
+            self._seekable = self._f.seekable() and (
+                self._own or stat.S_ISREG(os.fstat(self._f.fileno()).st_mode))
+        except (AttributeError, OSError, ValueError):
+            self._seekable = False
+        self._start = self._f.tell() if self._seekable else 0
+        if not raw:
+            size = 0 if self._seekable else self._MAX_RIFF
+            self._f.write(self._header(riff_size=size, data_size=size))
+
+    def _header(self, riff_size: int, data_size: int) -> bytes:
+        return wav_header(self.sr, self.channels, self.frames, riff_size, data_size, self.metadata)
+
+    def write(self, block: np.ndarray) -> None:
+        """Append a float block of shape (frames,) or (frames, channels)."""
+        if block.ndim == 1:
+            block = block[:, None]
+        if block.shape[1] != self.channels:
+            raise ValueError(f"Expected {self.channels} channel(s), got {block.shape[1]}")
+        for s in range(0, block.shape[0], self._BUF_FRAMES):
+            part = block[s:s + self._BUF_FRAMES]
+            m = part.shape[0]
+            pcm = to_pcm16(part, self._pcm[:m], rng=self._rng if self.dither else None,
+                           scratch=self._scratch[:m])
+            self._f.write(pcm.tobytes())
+            self.frames += m
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        if not self.raw and self._seekable:
+            data_size = self.frames * self.channels * 2
+            end = self._f.tell()
+            self._f.seek(self._start)
+            self._f.write(self._header(riff_size=end - self._start - 8, data_size=data_size))
+            self._f.seek(end)
+        if self._own:
+            self._f.close()
+        else:
+            self._f.flush()
+
+    def __enter__(self) -> "WavWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_writer(path, sr: int = 44100, channels: int = 2, *, fmt: str = "wav", metadata=None,
+                workers: int = 0, **kw):
+    """WavWriter or FlacWriter (same interface); metadata from track_metadata(fmt, ...)."""
+    if fmt == "flac":
+        from flac_writer import FlacWriter
+
+        return FlacWriter(path, sr, channels, metadata=metadata or (), workers=workers, **kw)
+    if fmt != "wav":
+        raise ValueError(f"Unknown format '{fmt}' (expected one of {', '.join(FORMATS)})")
+    return WavWriter(path, sr, channels, metadata=metadata or b"", **kw)
+
+
+def save_wav(path: str, data: np.ndarray, sr: int = 44100, metadata: bytes = b"") -> None:
     """Write a mono/stereo float array in [-1, 1] to a 16-bit WAV file."""
     if data.ndim == 1:
         data = data[:, None]
-    data_i16 = (np.clip(data, -1.0, 1.0) * 32767.0).astype(np.int16)
-    with wave.open(path, "w") as wf:
-        wf.setnchannels(data_i16.shape[1])
-        wf.setsampwidth(2)  # 16-bit
-        wf.setframerate(sr)
-        wf.writeframes(data_i16.tobytes())
+    with WavWriter(path, sr, data.shape[1], dither=False, metadata=metadata) as wf:
+        wf.write(data)
+
+
+class OscillatorBank:
+    """Bank of sine oscillators driven by float64 phase accumulators.
+
+    ``render`` fills a preallocated ``(frames, len(freqs))`` float32 buffer
+    block by block; phases are kept modulo 2*pi, so precision does not
+    degrade with track length.
+    """
+
+    def __init__(self, freqs, sr: int, block: int = TONE_BLOCK) -> None:
+        self.step = 2.0 * np.pi * np.asarray(freqs, dtype=np.float64) / float(sr)
+        self.phase = np.zeros_like(self.step)
+        self._ramp = np.arange(block, dtype=np.float64)[:, None]
+        self._ph = np.empty((block, self.step.shape[0]), dtype=np.float64)
+
+    def render(self, out: np.ndarray) -> np.ndarray:
+        m = out.shape[0]
+        ph = self._ph[:m]
+        np.multiply(self._ramp[:m], self.step, out=ph)
+        ph += self.phase
+        np.sin(ph, out=ph)
+        out[...] = ph
+        self.phase = np.mod(self.phase + self.step * m, 2.0 * np.pi)
+        return out
+
+
+class ToneSynth:
+    """Block-by-block binaural / isochronic synthesis into preallocated buffers.
+
+    Only the oscillators needed by ``modes`` are run; the fade envelope is
+    computed once per block and shared by both outputs.
+    """
+
+    def __init__(
+        self,
+        beat_hz: float,
+        n: int,
+        sr: int = 44100,
+        binaural_carriers: Tuple[float, float] = (220.0, 224.0),
+        iso_carrier: float = 400.0,
+        amp: float = 0.3,
+        block: int = TONE_BLOCK,
+        modes: Sequence[str] = MODES,
+    ) -> None:
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise ValueError(f"Unknown tone mode(s): {', '.join(sorted(unknown))}")
+        self.modes = tuple(m for m in MODES if m in modes)
+        self.n = int(n)
+        self.amp = np.float32(amp)
+        freqs = []
+        if "binaural" in self.modes:
+            freqs += [binaural_carriers[0], binaural_carriers[1]]  # left, right carrier
+        if "iso" in self.modes:
+            freqs += [beat_hz, iso_carrier]  # beat (AM), iso carrier
+        self.bank = OscillatorBank(freqs, sr, block)
+        self._osc = np.empty((block, len(freqs)), dtype=np.float32)
+        self._env = np.empty(block, dtype=np.float32)
+        # 0.5 s fade in/out
+        self.fade = int(sr * 0.5)
+        self.pos = 0
+
+    def _envelope(self, m: int) -> np.ndarray:
+        env = self._env[:m]
+        if self.fade > 0 and self.fade * 2 < self.n:
+            i = np.arange(self.pos, self.pos + m, dtype=np.float64)
+            ramp = np.minimum(i, self.n - 1 - i) / (self.fade - 1) if self.fade > 1 else i * 0.0
+            env[:] = np.minimum(ramp, 1.0)
+        else:
+            env.fill(1.0)
+        return env
+
+    def render(self, binaural: Optional[np.ndarray] = None, isochronic: Optional[np.ndarray] = None) -> None:
+        """Fill the next frames of the requested (frames, 2) outputs."""
+        m = (binaural if binaural is not None else isochronic).shape[0]
+        osc = self.bank.render(self._osc[:m])
+        env_amp = self._envelope(m)
+        env_amp *= self.amp
+        col = 0
+
+        if "binaural" in self.modes:
+            # Binaural: L/R carriers
+            np.multiply(osc[:, 0], env_amp, out=binaural[:, 0])
+            np.multiply(osc[:, 1], env_amp, out=binaural[:, 1])
+            col = 2
+
+        if "iso" in self.modes:
+            # Isochronic: AM at beat_hz on carrier
+            am = osc[:, col]
+            am += np.float32(1.0)
+            am *= np.float32(0.5)
+            am *= env_amp
+            np.multiply(am, osc[:, col + 1], out=isochronic[:, 0])
+            isochronic[:, 1] = isochronic[:, 0]
+        self.pos += m
+
+
+def tone_blocks(
+    beat_hz: float,
+    duration_sec: float = 600,
+    sr: int = 44100,
+    binaural_carriers: Tuple[float, float] = (220.0, 224.0),
+    iso_carrier: float = 400.0,
+    amp: float = 0.3,
+    block: int = TONE_BLOCK,
+    modes: Sequence[str] = MODES,
+) -> Iterator[Tuple[Optional[np.ndarray], Optional[np.ndarray]]]:
+    """Yield (binaural, isochronic) stereo float32 blocks; unrequested modes are None.
+
+    The yielded arrays are reused buffers: consume (or copy) each block
+    before advancing the iterator.
+    """
+    n = int(sr * duration_sec)
+    synth = ToneSynth(beat_hz, n, sr, binaural_carriers, iso_carrier, amp, block, modes)
+    binaural = np.empty((block, 2), dtype=np.float32) if "binaural" in synth.modes else None
+    isochronic = np.empty((block, 2), dtype=np.float32) if "iso" in synth.modes else None
+    for s in range(0, n, block):
+        m = min(block, n - s)
+        b = binaural[:m] if binaural is not None else None
+        i = isochronic[:m] if isochronic is not None else None
+        synth.render(b, i)
+        yield b, i
+
+
+def write_tones(
+    paths: Dict[str, str],
+    beat_hz: float,
+    duration_sec: float = 600,
+    sr: int = 44100,
+    binaural_carriers: Tuple[float, float] = (220.0, 224.0),
+    iso_carrier: float = 400.0,
+    amp: float = 0.3,
+    telemetry=None,
+    metadata: Optional[Dict[str, bytes]] = None,
+    fmt: str = "wav",
+    workers: int = 0,
+) -> None:
+    """Stream tones straight into WAV (or FLAC) files; ``paths`` maps "binaural"/"iso" to a path.
+
+    Only the modes present in ``paths`` are synthesized. ``metadata`` maps a
+    mode to its track_metadata(fmt, ...) encoding; ``workers`` > 1 encodes
+    FLAC on a process pool. ``telemetry`` (a bg_core.telemetry.Telemetry)
+    records "synth" and "<fmt>_write" (e.g. "flac_write") stages.
+    """
+    if not paths:
+        return
+
+    def stage(name: str):
+        return telemetry.stage(name) if telemetry is not None else nullcontext({})
+
+    with ExitStack() as stack:
+        metadata = metadata or {}
+        writers = {mode: stack.enter_context(open_writer(path, sr, 2, fmt=fmt, metadata=metadata.get(mode),
+                                                         workers=workers))
+                   for mode, path in paths.items()}
+        blocks = tone_blocks(beat_hz, duration_sec, sr, binaural_carriers, iso_carrier, amp, modes=tuple(writers))
+        while True:
+            with stage("synth") as st:
+                binaural, isochronic = next(blocks, (None, None))
+                first = binaural if binaural is not None else isochronic
+                st["frames"] = 0 if first is None else first.shape[0]
+            if first is None:
+                break
+            with stage(f"{fmt}_write") as st:
+                st["frames"] = first.shape[0]
+                if binaural is not None:
+                    writers["binaural"].write(binaural)
+                if isochronic is not None:
+                    writers["iso"].write(isochronic)
 
 
 def make(
@@ -110,34 +527,21 @@ def make(
     binaural_carriers: Tuple[float, float] = (220.0, 224.0),
     iso_carrier: float = 400.0,
     amp: float = 0.3,
-) -> Tuple[np.ndarray, np.ndarray, int]:
-    """Generate binaural and isochronic tones at the given beat frequency."""
-    n = int(sr * duration_sec)
-    t = np.arange(n, dtype=np.float32) / np.float32(sr)
-
-    # 0.5 s fade in/out
-    fade = int(sr * 0.5)
-    env = np.ones_like(t, dtype=np.float32)
-    if fade > 0 and fade * 2 < n:
-        env[:fade] = np.linspace(0.0, 1.0, fade, dtype=np.float32)
-        env[-fade:] = np.linspace(1.0, 0.0, fade, dtype=np.float32)
-
-    two_pi = np.float32(2.0 * np.pi)
-    l32, r32 = map(np.float32, binaural_carriers)
-    beat32 = np.float32(beat_hz)
-    iso_c32 = np.float32(iso_carrier)
-    amp32 = np.float32(amp)
-
-    # Binaural: L/R carriers
-    left = env * amp32 * np.sin(two_pi * l32 * t)
-    right = env * amp32 * np.sin(two_pi * r32 * t)
-    binaural = np.stack([left, right], axis=1)
-
-    # Isochronic: AM at beat_hz on carrier
-    am = env * (np.float32(0.5) * (np.float32(1.0) + np.sin(two_pi * beat32 * t)))
-    iso = am * amp32 * np.sin(two_pi * iso_c32 * t)
-    isochronic = np.stack([iso, iso], axis=1)
+    modes: Sequence[str] = MODES,
+) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], int]:
+    """Generate binaural and/or isochronic tones at the given beat frequency.
 
+    ``modes`` selects which outputs are synthesized; the others are returned as None.
+    """
+    n = int(sr * duration_sec)
+    synth = ToneSynth(beat_hz, n, sr, binaural_carriers, iso_carrier, amp, modes=modes)
+    binaural = np.empty((n, 2), dtype=np.float32) if "binaural" in synth.modes else None
+    isochronic = np.empty((n, 2), dtype=np.float32) if "iso" in synth.modes else None
+    for s in range(0, n, TONE_BLOCK):
+        synth.render(
+            binaural[s:s + TONE_BLOCK] if binaural is not None else None,
+            isochronic[s:s + TONE_BLOCK] if isochronic is not None else None,
+        )
     return binaural, isochronic, sr
 
 
@@ -155,6 +559,7 @@ def main() -> None:
     parser.add_argument("--iso-carrier", type=float, default=400.0)
     parser.add_argument("--sr", type=int, default=44100)
     parser.add_argument("--out", default=".")
+    parser.add_argument("--format", choices=FORMATS, default="wav", help="Output container.")
     parser.add_argument("--title-prefix", default="", help="Prefix for track titles.")
     parser.add_argument("--artist", default="TamerOnLine")
     parser.add_argument("--year", default="2025")
@@ -168,38 +573,19 @@ def main() -> None:
     args = parser.parse_args()
 
     dur = int(args.minutes * 60)
-    binaural, iso, sr = make(
-        beat_hz=args.freq,
-        duration_sec=dur,
-        sr=args.sr,
-        binaural_carriers=tuple(args.binaural),
-        iso_carrier=args.iso_carrier,
-        amp=args.amp,
-    )
-
     os.makedirs(args.out, exist_ok=True)
 
+    paths = {}
     if args.mode in ("binaural", "both"):
-        binaural_path = os.path.join(args.out, f"{args.freq:g}hz_binaural.wav")
-        save_wav(binaural_path, binaural, sr)
-        set_wav_metadata(
-            binaural_path,
-            title=f"{args.title_prefix} {args.freq:g} Hz Binaural".strip(),
-            artist=args.artist,
-            comment="Generated by music4hz",
-            year=args.year,
-            copyright_=args.copyright,
-            url=args.url,
-            email=args.email,
-            artwork_path=args.artwork,
-        )
-
+        paths["binaural"] = os.path.join(args.out, f"{args.freq:g}hz_binaural.{args.format}")
     if args.mode in ("iso", "both"):
-        iso_path = os.path.join(args.out, f"{args.freq:g}hz_iso.wav")
-        save_wav(iso_path, iso, sr)
-        set_wav_metadata(
-            iso_path,
-            title=f"{args.title_prefix} {args.freq:g} Hz Isochronic".strip(),
+        paths["iso"] = os.path.join(args.out, f"{args.freq:g}hz_iso.{args.format}")
+
+    labels = {"binaural": "Binaural", "iso": "Isochronic"}
+    metadata = {
+        mode: track_metadata(
+            args.format,
+            title=f"{args.title_prefix} {args.freq:g} Hz {labels[mode]}".strip(),
             artist=args.artist,
             comment="Generated by music4hz",
             year=args.year,
@@ -208,6 +594,19 @@ def main() -> None:
             email=args.email,
             artwork_path=args.artwork,
         )
+        for mode in paths
+    }
+    write_tones(
+        paths,
+        beat_hz=args.freq,
+        duration_sec=dur,
+        sr=args.sr,
+        binaural_carriers=tuple(args.binaural),
+        iso_carrier=args.iso_carrier,
+        amp=args.amp,
+        metadata=metadata,
+        fmt=args.format,
+    )
 
     print("Done.")
 
@@ -0,0 +1,49 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from flac_writer import FlacWriter
+from sound import WavWriter
+
+
+def _signal(n=3 * 44100 + 123):
+    t = np.arange(n) / 44100
+    rng = np.random.default_rng(1)
+    x = np.stack([0.3 * np.sin(2 * np.pi * 220 * t), 0.2 * rng.standard_normal(n)], 1)
+    x[:5000] = 0.0  # exact zeros stay undithered in both writers
+    return np.clip(x, -1, 1).astype(np.float32)
+
+
+def _write(cls, path, x, block=30_000):
+    with cls(str(path), 44100, 2, seed=3) as w:
+        for s in range(0, x.shape[0], block):
+            w.write(x[s:s + block])
+
+
+def _wav_pcm(path):
+    data = path.read_bytes()
+    i = data.index(b"data")
+    size = int.from_bytes(data[i + 4:i + 8], "little")
+    return np.frombuffer(data[i + 8:i + 8 + size], dtype="<i2").reshape(-1, 2)
+
+
+def test_flac_streaminfo_md5_matches_wav_pcm(tmp_path):
+    # STREAMINFO carries the MD5 of the decoded samples: equal MD5 -> same PCM as the WAV
+    x = _signal()
+    _write(WavWriter, tmp_path / "a.wav", x)
+    _write(FlacWriter, tmp_path / "a.flac", x)
+    pcm = _wav_pcm(tmp_path / "a.wav")
+    info = (tmp_path / "a.flac").read_bytes()[8:8 + 34]
+    assert int.from_bytes(info[10:18], "big") & ((1 << 36) - 1) == pcm.shape[0]
+    assert info[18:34] == hashlib.md5(pcm.tobytes()).digest()
+
+
+def test_flac_decodes_to_wav_pcm(tmp_path):
+    sf = pytest.importorskip("soundfile")
+    x = _signal()
+    _write(WavWriter, tmp_path / "a.wav", x)
+    _write(FlacWriter, tmp_path / "a.flac", x)
+    dec, sr = sf.read(str(tmp_path / "a.flac"), dtype="int16")
+    assert sr == 44100
+    assert np.array_equal(dec, _wav_pcm(tmp_path / "a.wav"))
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from bg_core.engine import stream_profile
+from bg_core.parallel import render_parallel, stream_segments
+
+MINUTES = 0.3  # ~12 engine blocks
+SEED = 5
+
+
+def _profile(name):
+    from pathlib import Path
+    return str(Path(__file__).resolve().parents[1] / "profiles" / f"{name}.json")
+
+
+def _mono(name, block=1 << 16):
+    return np.concatenate([b.copy() for b in stream_profile(_profile(name), MINUTES, seed=SEED, block=block)])
+
+
+def _segments(name, workers, block=1 << 16):
+    return np.concatenate(list(stream_segments(_profile(name), MINUTES, seed=SEED, workers=workers,
+                                               block=block, chunk_blocks=2)))
+
+
+@pytest.mark.parametrize("name", ["sea", "rain"])
+def test_block_size_does_not_change_output(name):
+    assert np.array_equal(_mono(name), _mono(name, block=5000))
+
+
+@pytest.mark.parametrize("name", ["sea", "rain"])
+def test_worker_count_does_not_change_output(name):
+    one = _segments(name, 1)
+    assert np.array_equal(one, _segments(name, 3))
+    assert np.array_equal(one, _mono(name))
+
+
+def test_render_parallel_matches_across_workers_and_blocks():
+    ref = render_parallel(_profile("sea"), MINUTES, seed=SEED, workers=1, chunk_blocks=2)
+    assert np.array_equal(ref, render_parallel(_profile("sea"), MINUTES, seed=SEED, workers=3, chunk_blocks=2))
+    assert np.array_equal(ref, render_parallel(_profile("sea"), MINUTES, seed=SEED, workers=3,
+                                               block=1 << 15, chunk_blocks=4))
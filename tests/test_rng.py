@@ -0,0 +1,26 @@
+import numpy as np
+
+from bg_core.rng import noise_stream
+
+STATE = {"seed": 7, "step": 2, "op": "noise_white"}
+
+
+def test_noise_stream_seek_matches_full_read():
+    full = noise_stream(STATE).read(0, 200_000)
+    assert full.dtype == np.float32
+    # Reads inside a page, across a page boundary, at a page start and over several pages
+    for start, count in [(0, 10), (65_530, 20), (131_072, 1), (70_000, 100_000)]:
+        assert noise_stream(STATE).read(start, count).tobytes() == full[start:start + count].tobytes()
+
+
+def test_noise_stream_sequential_reads_do_not_depend_on_block_size():
+    ref = noise_stream(STATE).standard_normal(150_000)
+    for block in (1000, 4096, 65_536, 100_000):
+        stream = noise_stream(STATE)
+        parts = [stream.standard_normal(min(block, 150_000 - s)) for s in range(0, 150_000, block)]
+        assert np.concatenate(parts).tobytes() == ref.tobytes()
+
+
+def test_noise_stream_starts_at_render_start():
+    seeked = noise_stream(dict(STATE, start=123_456)).standard_normal(50)
+    assert seeked.tobytes() == noise_stream(STATE).read(123_456, 50).tobytes()
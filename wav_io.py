@@ -0,0 +1,108 @@
+"""
+wav_io.py — 16-bit PCM conversion and WAV/RF64 headers
+
+Shared by the streaming writers (sound.WavWriter, flac_writer.FlacWriter)
+and the segment-parallel renderer (bg_core.parallel), which fills a
+preallocated file in place through data_memmap().
+"""
+
+import struct
+from typing import Optional
+
+import numpy as np
+
+# Largest size a RIFF header field can hold; beyond it files switch to RF64
+MAX_RIFF = 0xFFFFFFFF
+
+
+def wav_header(sr: int, channels: int, frames: int, riff_size: int, data_size: int,
+                metadata: bytes = b"") -> bytes:
+    """RIFF (or RF64 when riff_size exceeds 4 GB) header up to and including the data chunk size."""
+    block_align = channels * 2
+    rf64 = riff_size > MAX_RIFF
+    if rf64:
+        ds64 = b"ds64" + struct.pack("<IQQQI", 28, riff_size, data_size, frames, 0)
+    else:
+        ds64 = b"JUNK" + struct.pack("<I", 28) + bytes(28)
+    fmt = b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sr, sr * block_align, block_align, 16)
+    return b"".join([
+        b"RF64" if rf64 else b"RIFF",
+        struct.pack("<I", MAX_RIFF if rf64 else riff_size),
+        b"WAVE",
+        ds64,
+        fmt,
+        metadata,
+        b"data",
+        struct.pack("<I", MAX_RIFF if rf64 else data_size),
+    ])
+
+
+def to_pcm16(x: np.ndarray, out: np.ndarray, *, rng: Optional[np.random.Generator] = None,
+             scratch: Optional[np.ndarray] = None) -> np.ndarray:
+    """Float frames in [-1, 1] -> int16 frames in out, TPDF-dithered when rng is given.
+
+    Exactly-zero samples are never dithered, so digital silence stays silent.
+    scratch (float32, x's shape; may be x itself) avoids a temporary.
+    """
+    tmp = scratch if scratch is not None else np.empty(x.shape, dtype=np.float32)
+    silent = x == 0 if rng is not None else None
+    np.multiply(x, np.float32(32767.0), out=tmp)
+    if rng is not None:
+        # TPDF dither: sum of two uniform variables in [-0.5, 0.5) LSB
+        tmp += rng.random(tmp.shape, dtype=np.float32)
+        tmp -= rng.random(tmp.shape, dtype=np.float32)
+        np.rint(tmp, out=tmp)
+        tmp[silent] = 0.0
+    np.clip(tmp, -32767.0, 32767.0, out=tmp)
+    np.copyto(out, tmp, casting="unsafe")
+    return out
+
+
+def preallocate_wav(path: str, frames: int, sr: int = 44100, channels: int = 2, *,
+                    metadata: bytes = b"") -> None:
+    """Create a 16-bit WAV (RF64 past 4 GB) of the given length with a final header.
+
+    The data region is allocated sparsely (zeros), so writers may fill
+    disjoint frame ranges in any order through data_memmap(path).
+    """
+    data_size = int(frames) * channels * 2
+    head = len(wav_header(sr, channels, frames, 0, 0, metadata))
+    header = wav_header(sr, channels, frames, head - 8 + data_size, data_size, metadata)
+    with open(path, "wb") as f:
+        f.write(header)
+        f.truncate(len(header) + data_size)
+
+
+def wav_memmap(path: str, frames: int, sr: int = 44100, channels: int = 2, *,
+               metadata: bytes = b"") -> np.memmap:
+    """preallocate_wav() and map its data region as an int16 (frames, channels) array."""
+    preallocate_wav(path, frames, sr, channels, metadata=metadata)
+    return data_memmap(path)
+
+
+def data_memmap(path: str) -> np.memmap:
+    """Map the data chunk of an existing 16-bit PCM WAV/RF64 file (read-write)."""
+    with open(path, "rb") as f:
+        head = f.read(12)
+        if head[:4] not in (b"RIFF", b"RF64") or head[8:12] != b"WAVE":
+            raise ValueError(f"Not a WAV file: {path}")
+        channels = 2
+        data_size = None
+        while True:
+            cid, size = struct.unpack("<4sI", f.read(8))
+            if cid == b"ds64":
+                _, data_size, _ = struct.unpack("<QQQ", f.read(24))
+                f.seek(size - 24 + (size & 1), 1)
+            elif cid == b"fmt ":
+                fmt = f.read(size)
+                channels = struct.unpack("<H", fmt[2:4])[0]
+                f.seek(size & 1, 1)
+            elif cid == b"data":
+                offset = f.tell()
+                if data_size is None:
+                    data_size = size
+                break
+            else:
+                f.seek(size + (size & 1), 1)
+    frames = data_size // (channels * 2)
+    return np.memmap(path, dtype="<i2", mode="r+", offset=offset, shape=(frames, channels))